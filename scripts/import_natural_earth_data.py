@@ -13,24 +13,35 @@ Data source: https://www.naturalearthdata.com/downloads/10m-cultural-vectors/10m
 GitHub: https://github.com/nvkelso/natural-earth-vector/blob/master/10m_cultural
 
 Usage:
-    python3 import_natural_earth_data.py --project-id your-project-id [--dry-run]
+    python3 import_natural_earth_data.py --project-id your-project-id [--dry-run] [--cache-dir DIR | --no-cache]
+
+Downloaded zips are cached in ~/.cache/statlas/natural_earth and revalidated with
+a conditional GET (ETag / Last-Modified), so repeat runs skip unchanged downloads.
 """
 
 import argparse
 import sys
 import os
-import time
 import zipfile
 import tempfile
 import shutil
 import json
+import re
+import hashlib
+import gzip
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterable, Optional
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 from google.cloud import firestore
 from google.cloud import storage
+from shapely.geometry import mapping
 from tqdm import tqdm
 
 # Natural Earth 10m Cultural data URLs - Correct download links
@@ -53,68 +64,53 @@ NATURAL_EARTH_FILES = {
     }
 }
 
-class NaturalEarthImporter:
-    def __init__(self, project_id: str, dry_run: bool = False):
-        self.project_id = project_id
-        self.dry_run = dry_run
-        self.temp_dir = None
-        
-        if not dry_run:
-            # Initialize Firestore client with statlas-content database
-            self.db = firestore.Client(project=project_id, database="statlas-content")
-        
-        print(f"🌍 Natural Earth Data Importer")
-        print(f"📋 Project ID: {project_id}")
-        print(f"🔍 Dry run: {dry_run}")
-        print(f"📊 Data source: Natural Earth 10m Cultural Vectors")
-        print()
+# Shapefile columns read by the processors; everything else is dropped on load
+SHAPEFILE_COLUMNS = [
+    "NAME", "NAME_LONG", "ADMIN", "SOVEREIGNT", "TYPE", "LEVEL", "ADM0_A3",
+    "ISO_A2", "ISO_A3", "ISO_N3", "POP_EST", "geometry",
+]
 
-    def download_and_extract_data(self) -> Dict[str, str]:
-        """Download and extract all Natural Earth data files."""
-        print("📥 Downloading Natural Earth 10m Cultural data...")
-        
-        self.temp_dir = tempfile.mkdtemp(prefix="natural_earth_")
-        extracted_paths = {}
-        
-        for file_key, file_info in NATURAL_EARTH_FILES.items():
-            print(f"   Downloading {file_info['description']}...")
-            
-            # Download the zip file
-            response = requests.get(file_info["url"], stream=True)
-            response.raise_for_status()
-            
-            zip_path = os.path.join(self.temp_dir, f"{file_key}.zip")
-            
-            with open(zip_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            # Extract the zip file
-            extract_dir = os.path.join(self.temp_dir, file_key)
-            os.makedirs(extract_dir, exist_ok=True)
-            
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
-            
-            # Find the shapefile
-            shp_file = None
-            for root, dirs, files in os.walk(extract_dir):
-                for file in files:
-                    if file.endswith('.shp'):
-                        shp_file = os.path.join(root, file)
-                        break
-                if shp_file:
-                    break
-            
-            if not shp_file:
-                raise FileNotFoundError(f"No shapefile found in {file_key}")
-            
-            extracted_paths[file_key] = shp_file
-            print(f"   ✅ Extracted: {os.path.basename(shp_file)}")
-        
-        print(f"📁 Data extracted to: {self.temp_dir}")
-        print()
-        return extracted_paths
+# Runs of characters that are not allowed in document IDs. [\W_] rather than
+# [^a-z0-9] so non-ASCII letters are kept, matching str.isalnum().
+ID_SEPARATOR_RE = re.compile(r'[\W_]+')
+
+# Name keywords marking a map subunit as an island rather than mainland
+ISLAND_NAME_RE = re.compile(r'island|isle|atoll|archipelago')
+
+# Persistent download cache, keyed by URL and revalidated with ETag / Last-Modified
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "statlas", "natural_earth")
+
+# Read downloads in 1MB chunks - the zips are tens of MB, so 8KB chunks mean thousands of writes
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Firestore batch commits allowed in flight at once during import
+MAX_IN_FLIGHT_COMMITS = 4
+
+# Simplification tolerances in degrees, tried in order until the GeoJSON fits
+# under the size limit (0.01 ~ 1km)
+SIMPLIFY_TOLERANCES = (0.01, 0.02, 0.05, 0.1, 0.25, 0.5)
+
+# Firestore documents max out at 1MB; leave headroom for the other fields
+GEOMETRY_SIZE_LIMIT = 900000
+
+# Equal-area projection used for area_km2 (World Mollweide)
+EQUAL_AREA_CRS = "ESRI:54009"
+
+# Decimal places kept for GeoJSON coordinates (5 decimals ~ 1.1m at the equator)
+COORDINATE_PRECISION = 5
+
+class NaturalEarthProcessor:
+    """Turns Natural Earth shapefiles into Firestore-ready records.
+
+    Holds no clients or other unpicklable state when constructed so each
+    shapefile can be processed in its own worker process; the Cloud Storage
+    client used for geometry offload is created lazily inside the worker.
+    """
+
+    def __init__(self, project_id: Optional[str] = None, geometry_bucket: Optional[str] = None):
+        self.project_id = project_id
+        self.geometry_bucket = geometry_bucket
+        self._bucket = None
 
     def process_sovereignty_data(self, shapefile_path: str) -> List[Dict[str, Any]]:
         """
@@ -123,43 +119,46 @@ class NaturalEarthImporter:
         """
         print("🏛️ Processing Sovereign States data...")
         
-        gdf = gpd.read_file(shapefile_path)
+        gdf = self._read_shapefile(shapefile_path)
         print(f"   Total features loaded: {len(gdf)}")
         
-        # Apply Natural Earth filtering rules for sovereignty
+        # Apply Natural Earth filtering rules for sovereignty, combined into
+        # one mask so the frame is only copied once
+        mask = np.ones(len(gdf), dtype=bool)
+        
         # Remove level=2, level=3, level=4 units
         if 'LEVEL' in gdf.columns:
-            gdf = gdf[~gdf['LEVEL'].isin([2, 3, 4])]
-            print(f"   After level filtering: {len(gdf)}")
+            mask &= ~gdf['LEVEL'].isin([2, 3, 4]).to_numpy()
+            print(f"   After level filtering: {mask.sum()}")
         
         # Remove type=Dependency, type=Lease, type=Country
         if 'TYPE' in gdf.columns:
-            gdf = gdf[~gdf['TYPE'].isin(['Dependency', 'Lease', 'Country'])]
-            print(f"   After type filtering: {len(gdf)}")
+            mask &= ~gdf['TYPE'].isin(['Dependency', 'Lease', 'Country']).to_numpy()
+            print(f"   After type filtering: {mask.sum()}")
+        
+        gdf = gdf[mask]
+        
+        # Build IDs, bounds and areas for all rows at once rather than per row
+        gdf = gdf.assign(
+            _id_name=self._create_ids(gdf, 'NAME'),
+            **self._calculate_geometry_metrics(gdf),
+        )
         
         sovereign_states = []
+        now = datetime.now(timezone.utc)  # One timestamp for every record in this pass
         
         for idx, row in tqdm(gdf.iterrows(), total=len(gdf), desc="Processing sovereign states"):
-            # Create sovereign state ID from name
-            state_id = self._create_id(row.get('NAME', ''))
+            # Sovereign state ID from name
+            state_id = row['_id_name']
             if not state_id:
                 continue
             
             # Use simplified geometry for Firestore (enables point-in-polygon queries)
-            geometry = None
-            if row.geometry is not None:
-                # Simplify geometry to reduce size (tolerance ~1km)
-                simplified_geom = row.geometry.simplify(tolerance=0.01)
-                geojson_str = gpd.GeoSeries([simplified_geom]).to_json()
-                geometry_obj = eval(geojson_str)['features'][0]['geometry']
-                
-                # Check if simplified geometry fits in Firestore
-                geometry_json = json.dumps(geometry_obj)
-                if len(geometry_json.encode('utf-8')) < 900000:  # 900KB safety limit
-                    geometry = geometry_json
+            geometry = self._serialize_geometry(row.geometry)
+            geometry_url = self._upload_geometry("sovereign_states", state_id, row.geometry)
             
-            # Calculate bounds
-            bounds = self._calculate_bounds(row.geometry)
+            # Bounds precomputed for all rows
+            bounds = row['_bounds']
             
             sovereign_state = {
                 "id": state_id,
@@ -173,12 +172,13 @@ class NaturalEarthImporter:
                 "bounds": bounds,
                 "capital": row.get('ADMIN', ''),
                 "population": self._safe_int(row.get('POP_EST', 0)),
-                "area_km2": self._safe_float(row.get('POP_EST', 0)),  # Use area calculation if available
+                "area_km2": row['_area_km2'],
                 "currency_code": "",  # Not available in base data
                 "languages": [],  # Not available in base data
                 "geometry": geometry,
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "geometry_url": geometry_url,
+                "created_at": now,
+                "updated_at": now,
                 "is_active": True
             }
             
@@ -194,41 +194,40 @@ class NaturalEarthImporter:
         """
         print("🌍 Processing Countries data...")
         
-        gdf = gpd.read_file(shapefile_path)
+        gdf = self._read_shapefile(shapefile_path)
         print(f"   Total features loaded: {len(gdf)}")
         
         # Apply Natural Earth filtering rules for countries
         # Remove level=3 and level=4 rows
         if 'LEVEL' in gdf.columns:
-            gdf = gdf[~gdf['LEVEL'].isin([3, 4])]
+            gdf = gdf[~gdf['LEVEL'].isin([3, 4]).to_numpy()]
             print(f"   After level filtering: {len(gdf)}")
         
+        # Build IDs, bounds and areas for all rows at once rather than per row
+        gdf = gdf.assign(
+            _id_name=self._create_ids(gdf, 'NAME'),
+            _id_sovereign=self._create_ids(gdf, 'SOVEREIGNT'),
+            **self._calculate_geometry_metrics(gdf),
+        )
+        
         countries = []
+        now = datetime.now(timezone.utc)  # One timestamp for every record in this pass
         
         for idx, row in tqdm(gdf.iterrows(), total=len(gdf), desc="Processing countries"):
-            # Create country ID from name
-            country_id = self._create_id(row.get('NAME', ''))
+            # Country ID from name
+            country_id = row['_id_name']
             if not country_id:
                 continue
             
-            # Find parent sovereign state
-            sovereign_state_id = self._create_id(row.get('SOVEREIGNT', ''))
+            # Parent sovereign state
+            sovereign_state_id = row['_id_sovereign']
             
             # Use simplified geometry for Firestore (enables point-in-polygon queries)
-            geometry = None
-            if row.geometry is not None:
-                # Simplify geometry to reduce size (tolerance ~1km)
-                simplified_geom = row.geometry.simplify(tolerance=0.01)
-                geojson_str = gpd.GeoSeries([simplified_geom]).to_json()
-                geometry_obj = eval(geojson_str)['features'][0]['geometry']
-                
-                # Check if simplified geometry fits in Firestore
-                geometry_json = json.dumps(geometry_obj)
-                if len(geometry_json.encode('utf-8')) < 900000:  # 900KB safety limit
-                    geometry = geometry_json
+            geometry = self._serialize_geometry(row.geometry)
+            geometry_url = self._upload_geometry("countries", country_id, row.geometry)
             
-            # Calculate bounds
-            bounds = self._calculate_bounds(row.geometry)
+            # Bounds precomputed for all rows
+            bounds = row['_bounds']
             
             country = {
                 "id": country_id,
@@ -242,10 +241,11 @@ class NaturalEarthImporter:
                 "bounds": bounds,
                 "capital": row.get('ADMIN', ''),
                 "population": self._safe_int(row.get('POP_EST', 0)),
-                "area_km2": self._safe_float(row.get('POP_EST', 0)),
+                "area_km2": row['_area_km2'],
                 "geometry": geometry,
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "geometry_url": geometry_url,
+                "created_at": now,
+                "updated_at": now,
                 "is_active": True
             }
             
@@ -261,42 +261,41 @@ class NaturalEarthImporter:
         """
         print("🗺️ Processing Map Units data...")
         
-        gdf = gpd.read_file(shapefile_path)
+        gdf = self._read_shapefile(shapefile_path)
         print(f"   Total features loaded: {len(gdf)}")
         
         # Apply Natural Earth filtering rules for map units
         # Remove level=4 rows
         if 'LEVEL' in gdf.columns:
-            gdf = gdf[gdf['LEVEL'] != 4]
+            gdf = gdf[(gdf['LEVEL'] != 4).to_numpy()]
             print(f"   After level filtering: {len(gdf)}")
         
+        # Build IDs, bounds and areas for all rows at once rather than per row
+        gdf = gdf.assign(
+            _id_name=self._create_ids(gdf, 'NAME'),
+            _id_sovereign=self._create_ids(gdf, 'SOVEREIGNT'),
+            **self._calculate_geometry_metrics(gdf),
+        )
+        
         map_units = []
+        now = datetime.now(timezone.utc)  # One timestamp for every record in this pass
         
         for idx, row in tqdm(gdf.iterrows(), total=len(gdf), desc="Processing map units"):
-            # Create map unit ID from name
-            unit_id = self._create_id(row.get('NAME', ''))
+            # Map unit ID from name
+            unit_id = row['_id_name']
             if not unit_id:
                 continue
             
-            # Find parent IDs
-            sovereign_state_id = self._create_id(row.get('SOVEREIGNT', ''))
-            country_id = self._create_id(row.get('NAME', ''))  # May be same as unit_id
+            # Parent IDs
+            sovereign_state_id = row['_id_sovereign']
+            country_id = row['_id_name']  # May be same as unit_id
             
             # Use simplified geometry for Firestore (enables point-in-polygon queries)
-            geometry = None
-            if row.geometry is not None:
-                # Simplify geometry to reduce size (tolerance ~1km)
-                simplified_geom = row.geometry.simplify(tolerance=0.01)
-                geojson_str = gpd.GeoSeries([simplified_geom]).to_json()
-                geometry_obj = eval(geojson_str)['features'][0]['geometry']
-                
-                # Check if simplified geometry fits in Firestore
-                geometry_json = json.dumps(geometry_obj)
-                if len(geometry_json.encode('utf-8')) < 900000:  # 900KB safety limit
-                    geometry = geometry_json
+            geometry = self._serialize_geometry(row.geometry)
+            geometry_url = self._upload_geometry("map_units", unit_id, row.geometry)
             
-            # Calculate bounds
-            bounds = self._calculate_bounds(row.geometry)
+            # Bounds precomputed for all rows
+            bounds = row['_bounds']
             
             map_unit = {
                 "id": unit_id,
@@ -311,10 +310,11 @@ class NaturalEarthImporter:
                 "iso_alpha3": row.get('ISO_A3', ''),
                 "bounds": bounds,
                 "population": self._safe_int(row.get('POP_EST', 0)),
-                "area_km2": self._safe_float(row.get('POP_EST', 0)),
+                "area_km2": row['_area_km2'],
                 "geometry": geometry,
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "geometry_url": geometry_url,
+                "created_at": now,
+                "updated_at": now,
                 "is_active": True
             }
             
@@ -330,41 +330,38 @@ class NaturalEarthImporter:
         """
         print("🏝️ Processing Map Subunits data...")
         
-        gdf = gpd.read_file(shapefile_path)
+        gdf = self._read_shapefile(shapefile_path)
         print(f"   Total features loaded: {len(gdf)}")
         
+        # Build IDs, bounds and areas for all rows at once rather than per row
+        gdf = gdf.assign(
+            _id_name=self._create_ids(gdf, 'NAME'),
+            _id_sovereign=self._create_ids(gdf, 'SOVEREIGNT'),
+            _id_admin=self._create_ids(gdf, 'ADMIN'),
+            **self._calculate_geometry_metrics(gdf),
+            _is_mainland=self._detect_mainland(gdf),
+        )
+        
         map_subunits = []
+        now = datetime.now(timezone.utc)  # One timestamp for every record in this pass
         
         for idx, row in tqdm(gdf.iterrows(), total=len(gdf), desc="Processing map subunits"):
-            # Create subunit ID from name
-            subunit_id = self._create_id(row.get('NAME', ''))
+            # Subunit ID from name
+            subunit_id = row['_id_name']
             if not subunit_id:
                 continue
             
-            # Find parent IDs
-            sovereign_state_id = self._create_id(row.get('SOVEREIGNT', ''))
-            country_id = self._create_id(row.get('ADMIN', ''))
-            map_unit_id = self._create_id(row.get('NAME', ''))  # May be same as subunit_id
+            # Parent IDs
+            sovereign_state_id = row['_id_sovereign']
+            country_id = row['_id_admin']
+            map_unit_id = row['_id_name']  # May be same as subunit_id
             
             # Use simplified geometry for Firestore (enables point-in-polygon queries)
-            geometry = None
-            if row.geometry is not None:
-                # Simplify geometry to reduce size (tolerance ~1km)
-                simplified_geom = row.geometry.simplify(tolerance=0.01)
-                geojson_str = gpd.GeoSeries([simplified_geom]).to_json()
-                geometry_obj = eval(geojson_str)['features'][0]['geometry']
-                
-                # Check if simplified geometry fits in Firestore
-                geometry_json = json.dumps(geometry_obj)
-                if len(geometry_json.encode('utf-8')) < 900000:  # 900KB safety limit
-                    geometry = geometry_json
-            
-            # Calculate bounds
-            bounds = self._calculate_bounds(row.geometry)
+            geometry = self._serialize_geometry(row.geometry)
+            geometry_url = self._upload_geometry("map_subunits", subunit_id, row.geometry)
             
-            # Determine if this is mainland or island
-            is_mainland = not any(keyword in row.get('NAME', '').lower() 
-                                for keyword in ['island', 'islands', 'isle', 'atoll', 'archipelago'])
+            # Bounds precomputed for all rows
+            bounds = row['_bounds']
             
             map_subunit = {
                 "id": subunit_id,
@@ -376,13 +373,14 @@ class NaturalEarthImporter:
                 "type": row.get('TYPE', 'Country'),
                 "level": self._safe_int(row.get('LEVEL', 1)),
                 "admin_level": row.get('ADM0_A3', ''),
-                "is_mainland": is_mainland,
+                "is_mainland": bool(row['_is_mainland']),
                 "bounds": bounds,
                 "population": self._safe_int(row.get('POP_EST', 0)),
-                "area_km2": self._safe_float(row.get('POP_EST', 0)),
+                "area_km2": row['_area_km2'],
                 "geometry": geometry,
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "geometry_url": geometry_url,
+                "created_at": now,
+                "updated_at": now,
                 "is_active": True
             }
             
@@ -391,66 +389,113 @@ class NaturalEarthImporter:
         print(f"   ✅ Processed {len(map_subunits)} map subunits")
         return map_subunits
 
-    def import_to_firestore(self, collection_name: str, data: List[Dict[str, Any]]):
-        """Import data to Firestore collection."""
-        if self.dry_run:
-            print(f"   🔍 Would import {len(data)} items to {collection_name}")
-            return
-        
-        print(f"   📤 Importing {len(data)} items to {collection_name}...")
+    # Helper methods
+    def _read_shapefile(self, shapefile_path: str) -> gpd.GeoDataFrame:
+        """Read a shapefile, keeping only the attribute columns the processors use."""
+        gdf = gpd.read_file(shapefile_path)
         
-        collection = self.db.collection(collection_name)
-        batch = self.db.batch()
-        batch_count = 0
+        # Natural Earth ships 100+ attribute columns; carrying them all through
+        # filtering and row iteration is wasted memory and time
+        return gdf[[c for c in SHAPEFILE_COLUMNS if c in gdf.columns]]
+
+    def _create_ids(self, gdf: pd.DataFrame, column: str) -> pd.Series:
+        """Create safe IDs for every name in a column."""
+        if column not in gdf.columns:
+            return pd.Series("", index=gdf.index)
+        
+        # Lowercase, collapse runs of non-alphanumeric chars to a single underscore
+        # and trim underscores from the ends
+        return (gdf[column].fillna("").astype(str)
+                .str.lower()
+                .str.strip()
+                .str.replace(ID_SEPARATOR_RE, '_', regex=True)
+                .str.strip('_')
+                .str.slice(0, 50))  # Limit length
+
+    def _serialize_geometry(self, geometry) -> Optional[str]:
+        """Simplify geometry and serialize it as compact GeoJSON, or None if it won't fit in Firestore."""
+        if geometry is None or geometry.is_empty:
+            return None
         
-        for item in tqdm(data, desc=f"Importing {collection_name}"):
-            doc_ref = collection.document(item['id'])
-            batch.set(doc_ref, item)
-            batch_count += 1
+        # Escalate the simplification tolerance until the geometry fits, so large
+        # countries get a coarser outline instead of being dropped entirely
+        for tolerance in SIMPLIFY_TOLERANCES:
+            geometry_json = self._encode_geometry(geometry.simplify(tolerance=tolerance, preserve_topology=True))
             
-            # Commit batch every 500 items (Firestore limit)
-            if batch_count >= 500:
-                batch.commit()
-                batch = self.db.batch()
-                batch_count = 0
-                time.sleep(0.1)  # Small delay to avoid rate limits
+            # Check if simplified geometry fits in Firestore
+            if len(geometry_json) < GEOMETRY_SIZE_LIMIT:
+                return geometry_json.decode('utf-8')
         
-        # Commit remaining items
-        if batch_count > 0:
-            batch.commit()
-        
-        print(f"   ✅ Imported {len(data)} items to {collection_name}")
+        return None
 
-    def cleanup(self):
-        """Clean up temporary files."""
-        if self.temp_dir and os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-            print(f"🧹 Cleaned up temporary files")
+    def _upload_geometry(self, collection_name: str, doc_id: str, geometry) -> Optional[str]:
+        """
+        Upload the unsimplified geometry to Cloud Storage as gzipped GeoJSON.
+        Returns the public URL, or None when offload is disabled or there is no geometry.
+        """
+        if not self.geometry_bucket or geometry is None or geometry.is_empty:
+            return None
+        
+        if self._bucket is None:
+            self._bucket = storage.Client(project=self.project_id).bucket(self.geometry_bucket)
+        
+        # Not subject to the Firestore size limit, so the source outline is kept
+        # as-is (coordinates rounded to ~1m, finer than the 10m source data)
+        geometry_json = self._encode_geometry(geometry)
+        
+        blob = self._bucket.blob(f"geometries/{collection_name}/{doc_id}.geojson.gz")
+        blob.content_encoding = "gzip"
+        blob.upload_from_string(gzip.compress(geometry_json), content_type="application/geo+json")
+        return blob.public_url
 
-    # Helper methods
-    def _create_id(self, name: str) -> str:
-        """Create a safe ID from a name."""
-        if not name:
-            return ""
+    def _encode_geometry(self, geometry) -> bytes:
+        """Encode geometry as minified GeoJSON with rounded coordinates."""
+        geometry_obj = mapping(geometry)
+        geometry_obj = {
+            "type": geometry_obj["type"],
+            "coordinates": self._round_coordinates(geometry_obj["coordinates"]),
+        }
         
-        # Convert to lowercase and replace spaces/special chars with underscores
-        safe_id = name.lower().strip()
-        safe_id = ''.join(c if c.isalnum() else '_' for c in safe_id)
-        safe_id = '_'.join(filter(None, safe_id.split('_')))  # Remove empty parts
+        # orjson emits minified JSON as bytes, so size checks need no re-encode
+        return orjson.dumps(geometry_obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def _round_coordinates(self, coordinates):
+        """Recursively round GeoJSON coordinates; precision beyond ~1m is noise at Natural Earth's 1:10m scale."""
+        if isinstance(coordinates, (int, float)):
+            return round(coordinates, COORDINATE_PRECISION)
+        return [self._round_coordinates(c) for c in coordinates]
+
+    def _detect_mainland(self, gdf: pd.DataFrame) -> pd.Series:
+        """Flag rows as mainland unless the name marks them as an island group."""
+        if 'NAME' not in gdf.columns:
+            return pd.Series(True, index=gdf.index)
         
-        return safe_id[:50]  # Limit length
+        return ~gdf['NAME'].fillna("").str.lower().str.contains(ISLAND_NAME_RE, na=False)
 
-    def _calculate_bounds(self, geometry) -> Dict[str, float]:
-        """Calculate bounding box from geometry."""
-        if geometry is None or geometry.is_empty:
-            return {"min_lat": 0, "max_lat": 0, "min_lon": 0, "max_lon": 0}
+    def _calculate_geometry_metrics(self, gdf: gpd.GeoDataFrame) -> Dict[str, pd.Series]:
+        """
+        Calculate WGS84 bounds and area in km² for every geometry.
+        The geometries are reprojected to the equal-area CRS once, for all metric measurements.
+        """
+        geometries = gdf.geometry
+        if geometries.crs is None:
+            geometries = geometries.set_crs("EPSG:4326")  # Natural Earth ships in WGS84
+        
+        # Missing or empty geometries get zero bounds and area
+        bounds = geometries.bounds.fillna(0.0)
+        metric_geometries = geometries.to_crs(EQUAL_AREA_CRS)
         
-        bounds = geometry.bounds
         return {
-            "min_lat": float(bounds[1]),
-            "max_lat": float(bounds[3]),
-            "min_lon": float(bounds[0]),
-            "max_lon": float(bounds[2])
+            "_bounds": pd.Series([
+                {
+                    "min_lat": float(min_lat),
+                    "max_lat": float(max_lat),
+                    "min_lon": float(min_lon),
+                    "max_lon": float(max_lon)
+                }
+                for min_lon, min_lat, max_lon, max_lat in bounds.itertuples(index=False)
+            ], index=gdf.index),
+            "_area_km2": (metric_geometries.area / 1e6).fillna(0.0),
         }
 
     def _safe_int(self, value) -> int:
@@ -460,13 +505,6 @@ class NaturalEarthImporter:
         except (ValueError, TypeError):
             return 0
 
-    def _safe_float(self, value) -> float:
-        """Safely convert value to float."""
-        try:
-            return float(str(value))
-        except (ValueError, TypeError):
-            return 0.0
-
     def _get_flag_emoji(self, iso_a2: str) -> str:
         """Convert ISO A2 code to flag emoji."""
         if not iso_a2 or len(iso_a2) != 2:
@@ -475,6 +513,182 @@ class NaturalEarthImporter:
         # Convert to regional indicator symbols
         return ''.join(chr(ord(c) - ord('A') + 0x1F1E6) for c in iso_a2.upper())
 
+
+class NaturalEarthImporter:
+    def __init__(self, project_id: str, dry_run: bool = False, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 geometry_bucket: Optional[str] = None):
+        self.project_id = project_id
+        self.dry_run = dry_run
+        self.cache_dir = cache_dir
+        self.geometry_bucket = geometry_bucket
+        self.temp_dir = None
+        self.data_dir = None
+        
+        if not dry_run:
+            # Initialize Firestore client with statlas-content database
+            self.db = firestore.Client(project=project_id, database="statlas-content")
+        
+        print(f"🌍 Natural Earth Data Importer")
+        print(f"📋 Project ID: {project_id}")
+        print(f"🔍 Dry run: {dry_run}")
+        print(f"💾 Download cache: {cache_dir or 'disabled'}")
+        print(f"🪣 Geometry bucket: {geometry_bucket or 'disabled'}")
+        print(f"📊 Data source: Natural Earth 10m Cultural Vectors")
+        print()
+
+    def download_and_extract_data(self) -> Dict[str, str]:
+        """Download and extract all Natural Earth data files."""
+        print("📥 Downloading Natural Earth 10m Cultural data...")
+        
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.data_dir = self.cache_dir
+        else:
+            self.temp_dir = tempfile.mkdtemp(prefix="natural_earth_")
+            self.data_dir = self.temp_dir
+        
+        # Downloads are I/O-bound, so fetch all files concurrently over one
+        # pooled session (reusing TLS connections, retrying transient 5xx)
+        with self._create_download_session() as session, \
+                ThreadPoolExecutor(max_workers=len(NATURAL_EARTH_FILES)) as executor:
+            shp_files = executor.map(lambda item: self._download_and_extract_file(session, *item),
+                                     NATURAL_EARTH_FILES.items())
+            extracted_paths = dict(zip(NATURAL_EARTH_FILES.keys(), shp_files))
+        
+        print(f"📁 Data extracted to: {self.data_dir}")
+        print()
+        return extracted_paths
+
+    def _create_download_session(self) -> requests.Session:
+        """Create an HTTP session with connection pooling and retries for the downloads."""
+        retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=len(NATURAL_EARTH_FILES),
+                              pool_maxsize=len(NATURAL_EARTH_FILES),
+                              max_retries=retry)
+        
+        session = requests.Session()
+        session.mount("https://", adapter)
+        return session
+
+    def _download_and_extract_file(self, session: requests.Session, file_key: str,
+                                   file_info: Dict[str, str]) -> str:
+        """Download and extract a single Natural Earth zip, returning the shapefile path."""
+        print(f"   Downloading {file_info['description']}...")
+        
+        # Cache entries are keyed by URL so a changed source URL never reuses a stale zip
+        cache_key = hashlib.sha1(file_info["url"].encode('utf-8')).hexdigest()
+        zip_path = os.path.join(self.data_dir, f"{cache_key}.zip")
+        validators_path = f"{zip_path}.validators.json"
+        extract_dir = os.path.join(self.data_dir, cache_key)
+        
+        # Revalidate a previously downloaded zip instead of fetching it again
+        headers = {}
+        if os.path.exists(zip_path) and os.path.exists(validators_path):
+            with open(validators_path, 'r') as f:
+                validators = json.load(f)
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+        
+        # Download the zip file
+        response = session.get(file_info["url"], stream=True, headers=headers)
+        
+        if response.status_code == 304:
+            response.close()
+            print(f"   ♻️  Using cached {file_key} (not modified)")
+        else:
+            response.raise_for_status()
+            
+            # Write to a temporary name so an interrupted download never poisons the cache
+            partial_path = f"{zip_path}.part"
+            with open(partial_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(partial_path, zip_path)
+            
+            with open(validators_path, 'w') as f:
+                json.dump({
+                    "url": file_info["url"],
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }, f)
+            
+            # Drop any extraction of the previous zip
+            if os.path.exists(extract_dir):
+                shutil.rmtree(extract_dir)
+        
+        # Extract the zip file (cached extractions are reused as-is)
+        if not os.path.isdir(extract_dir):
+            os.makedirs(extract_dir)
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                zip_ref.extractall(extract_dir)
+        
+        # Find the shapefile
+        shp_file = None
+        for root, dirs, files in os.walk(extract_dir):
+            for file in files:
+                if file.endswith('.shp'):
+                    shp_file = os.path.join(root, file)
+                    break
+            if shp_file:
+                break
+        
+        if not shp_file:
+            raise FileNotFoundError(f"No shapefile found in {file_key}")
+        
+        print(f"   ✅ Extracted: {os.path.basename(shp_file)}")
+        return shp_file
+
+    def import_to_firestore(self, collection_name: str, data: Iterable[Dict[str, Any]]) -> int:
+        """Import data to Firestore collection, consuming it lazily. Returns the item count."""
+        if self.dry_run:
+            item_count = sum(1 for _ in data)
+            print(f"   🔍 Would import {item_count} items to {collection_name}")
+            return item_count
+        
+        print(f"   📤 Importing items to {collection_name}...")
+        
+        collection = self.db.collection(collection_name)
+        batch = self.db.batch()
+        batch_count = 0
+        item_count = 0
+        
+        # Commit batches in the background so the next batch is built while
+        # earlier commits are in flight. The client retries RESOURCE_EXHAUSTED
+        # itself, so no sleep is needed between batches.
+        with ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT_COMMITS) as executor:
+            pending_commits = []
+            
+            for item in tqdm(data, desc=f"Importing {collection_name}"):
+                doc_ref = collection.document(item['id'])
+                batch.set(doc_ref, item)
+                batch_count += 1
+                item_count += 1
+                
+                # Commit batch every 500 items (Firestore limit)
+                if batch_count >= 500:
+                    pending_commits.append(executor.submit(batch.commit))
+                    batch = self.db.batch()
+                    batch_count = 0
+            
+            # Commit remaining items
+            if batch_count > 0:
+                pending_commits.append(executor.submit(batch.commit))
+            
+            # Surface any commit failure
+            for commit in pending_commits:
+                commit.result()
+        
+        print(f"   ✅ Imported {item_count} items to {collection_name}")
+        return item_count
+
+    def cleanup(self):
+        """Clean up temporary files."""
+        if self.temp_dir and os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+            print(f"🧹 Cleaned up temporary files")
+
     def run_import(self):
         """Run the complete import process."""
         try:
@@ -484,28 +698,40 @@ class NaturalEarthImporter:
             print("🔄 Processing Natural Earth data...")
             print()
             
-            # Process each data type according to Natural Earth filtering rules
-            sovereign_states = self.process_sovereignty_data(extracted_paths['admin_0_sovereignty'])
-            countries = self.process_countries_data(extracted_paths['admin_0_countries'])
-            map_units = self.process_map_units_data(extracted_paths['admin_0_map_units'])
-            map_subunits = self.process_map_subunits_data(extracted_paths['admin_0_map_subunits'])
+            # Process each data type according to Natural Earth filtering rules.
+            # The shapefiles are independent and CPU-bound, so each gets its own process.
+            processor = NaturalEarthProcessor(self.project_id, None if self.dry_run else self.geometry_bucket)
+            jobs = {
+                "sovereign_states": (processor.process_sovereignty_data, 'admin_0_sovereignty'),
+                "countries": (processor.process_countries_data, 'admin_0_countries'),
+                "map_units": (processor.process_map_units_data, 'admin_0_map_units'),
+                "map_subunits": (processor.process_map_subunits_data, 'admin_0_map_subunits'),
+            }
+            
+            if not self.dry_run:
+                print("📤 Importing to Firestore...")
+            
+            imported_counts = {}
+            with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+                futures = {
+                    executor.submit(process, extracted_paths[file_key]): collection_name
+                    for collection_name, (process, file_key) in jobs.items()
+                }
+                
+                # Import each collection as soon as its processor finishes, overlapping
+                # Firestore writes with the shapefiles still being processed
+                for future in as_completed(futures):
+                    collection_name = futures[future]
+                    imported_counts[collection_name] = self.import_to_firestore(collection_name, future.result())
             
             print()
             print("📊 Import Summary:")
-            print(f"   • Sovereign States: {len(sovereign_states)}")
-            print(f"   • Countries: {len(countries)}")
-            print(f"   • Map Units: {len(map_units)}")
-            print(f"   • Map Subunits: {len(map_subunits)}")
-            print()
+            print(f"   • Sovereign States: {imported_counts['sovereign_states']}")
+            print(f"   • Countries: {imported_counts['countries']}")
+            print(f"   • Map Units: {imported_counts['map_units']}")
+            print(f"   • Map Subunits: {imported_counts['map_subunits']}")
             
-            # Import to Firestore
             if not self.dry_run:
-                print("📤 Importing to Firestore...")
-                self.import_to_firestore("sovereign_states", sovereign_states)
-                self.import_to_firestore("countries", countries)
-                self.import_to_firestore("map_units", map_units)
-                self.import_to_firestore("map_subunits", map_subunits)
-                
                 print()
                 print("🔍 Verifying import...")
                 self._verify_import()
@@ -542,17 +768,31 @@ Examples:
     
     # Dry run to see what would be imported
     python3 import_natural_earth_data.py --project-id statlas-467715 --dry-run
+    
+    # Force a fresh download into a temporary directory
+    python3 import_natural_earth_data.py --project-id statlas-467715 --no-cache
+    
+    # Also publish full-fidelity geometries to Cloud Storage
+    python3 import_natural_earth_data.py --project-id statlas-467715 --geometry-bucket statlas-content
         """
     )
     
     parser.add_argument("--project-id", required=True, help="Google Cloud project ID")
     parser.add_argument("--dry-run", action="store_true", 
                        help="Show what would be imported without actually importing")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                       help=f"Directory for cached downloads (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Download into a temporary directory that is removed afterwards")
+    parser.add_argument("--geometry-bucket",
+                       help="Also upload full-fidelity gzipped GeoJSON to this Cloud Storage bucket "
+                            "and store its URL in geometry_url")
     
     args = parser.parse_args()
     
     try:
-        importer = NaturalEarthImporter(args.project_id, args.dry_run)
+        cache_dir = None if args.no_cache else args.cache_dir
+        importer = NaturalEarthImporter(args.project_id, args.dry_run, cache_dir, args.geometry_bucket)
         importer.run_import()
     except KeyboardInterrupt:
         print("\n⚠️  Import interrupted by user")
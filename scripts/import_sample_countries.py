@@ -6,130 +6,50 @@ This script imports a basic set of countries with flags, capitals, and basic inf
 In production, you would import from authoritative sources like UN data or REST Countries API.
 
 Usage:
-    python3 import_sample_countries.py --project-id your-project-id [--dry-run]
+    python3 import_sample_countries.py --project-id your-project-id [--dry-run] [--max-workers N] [--force] [--verbose]
+
+Already-imported documents are tracked per project and database in a local
+SQLite manifest (~/.cache/statlas/import_manifest.sqlite); reruns skip
+unchanged documents that still exist in Firestore. Use --force to re-import
+everything.
 """
 
 import argparse
+import os
 import sys
-import time
-from datetime import datetime
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from types import MappingProxyType
+import orjson
 from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from sample_import import (
+    DEFAULT_MANIFEST_PATH,
+    MAX_WORKERS,
+    MINIBATCH_SIZE,
+    WriteRateLimiter,
+    load_imported_hashes,
+    open_manifest,
+    payload_hash,
+    record_imported,
+    write_minibatch,
+)
+
+# Firestore database the samples are imported into
+DATABASE_NAME = "statlas-content"
+
+# Directory holding the sample data files
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 
 # Sample country data (in production, load from external sources)
-SAMPLE_COUNTRIES = [
-    {
-        "id": "usa",
-        "name": "United States",
-        "official_name": "United States of America", 
-        "iso_alpha2": "US",
-        "iso_alpha3": "USA",
-        "iso_numeric": 840,
-        "flag_url": "https://cdn.statlas.com/flags/usa.svg",
-        "flag_emoji": "🇺🇸",
-        "bounds": {
-            "min_lat": 18.9110642,
-            "max_lat": 71.3577635,
-            "min_lon": -179.1506,
-            "max_lon": -66.9513812
-        },
-        "capital": "Washington, D.C.",
-        "population": 331893745,
-        "area_km2": 9833517,
-        "currency_code": "USD",
-        "languages": ["en"],
-        "is_active": True
-    },
-    {
-        "id": "fra",
-        "name": "France",
-        "official_name": "French Republic",
-        "iso_alpha2": "FR", 
-        "iso_alpha3": "FRA",
-        "iso_numeric": 250,
-        "flag_url": "https://cdn.statlas.com/flags/fra.svg",
-        "flag_emoji": "🇫🇷",
-        "bounds": {
-            "min_lat": 41.3253,
-            "max_lat": 51.1242,
-            "min_lon": -5.5591,
-            "max_lon": 9.6625
-        },
-        "capital": "Paris",
-        "population": 67413000,
-        "area_km2": 643801,
-        "currency_code": "EUR",
-        "languages": ["fr"],
-        "is_active": True
-    },
-    {
-        "id": "gbr",
-        "name": "United Kingdom",
-        "official_name": "United Kingdom of Great Britain and Northern Ireland",
-        "iso_alpha2": "GB",
-        "iso_alpha3": "GBR", 
-        "iso_numeric": 826,
-        "flag_url": "https://cdn.statlas.com/flags/gbr.svg",
-        "flag_emoji": "🇬🇧",
-        "bounds": {
-            "min_lat": 49.9028,
-            "max_lat": 60.8610,
-            "min_lon": -8.6493,
-            "max_lon": 1.7627
-        },
-        "capital": "London",
-        "population": 67886004,
-        "area_km2": 242495,
-        "currency_code": "GBP",
-        "languages": ["en"],
-        "is_active": True
-    },
-    {
-        "id": "jpn",
-        "name": "Japan",
-        "official_name": "Japan",
-        "iso_alpha2": "JP",
-        "iso_alpha3": "JPN",
-        "iso_numeric": 392,
-        "flag_url": "https://cdn.statlas.com/flags/jpn.svg", 
-        "flag_emoji": "🇯🇵",
-        "bounds": {
-            "min_lat": 24.0456,
-            "max_lat": 45.5514,
-            "min_lon": 122.9346,
-            "max_lon": 153.9866
-        },
-        "capital": "Tokyo",
-        "population": 125584838,
-        "area_km2": 377930,
-        "currency_code": "JPY",
-        "languages": ["ja"],
-        "is_active": True
-    },
-    {
-        "id": "can",
-        "name": "Canada", 
-        "official_name": "Canada",
-        "iso_alpha2": "CA",
-        "iso_alpha3": "CAN",
-        "iso_numeric": 124,
-        "flag_url": "https://cdn.statlas.com/flags/can.svg",
-        "flag_emoji": "🇨🇦",
-        "bounds": {
-            "min_lat": 41.6765,
-            "max_lat": 83.2364,
-            "min_lon": -141.0027,
-            "max_lon": -52.6480
-        },
-        "capital": "Ottawa",
-        "population": 38232593,
-        "area_km2": 9984670,
-        "currency_code": "CAD",
-        "languages": ["en", "fr"],
-        "is_active": True
-    }
-]
+with open(os.path.join(DATA_DIR, "sample_countries.json"), "rb") as f:
+    # Read-only so the import never mutates the shared sample records
+    SAMPLE_COUNTRIES = tuple(MappingProxyType(country) for country in orjson.loads(f.read()))
 
-def import_countries(project_id: str, dry_run: bool = False):
+def import_countries(project_id: str, dry_run: bool = False, max_workers: int = MAX_WORKERS,
+                     manifest_path: str = DEFAULT_MANIFEST_PATH, force: bool = False,
+                     verbose: bool = False):
     """Import sample countries into Firestore."""
     print("🌍 Importing sample countries to statlas-content database...")
     print(f"📋 Project ID: {project_id}")
@@ -138,64 +58,79 @@ def import_countries(project_id: str, dry_run: bool = False):
     
     if not dry_run:
         # Initialize Firestore client with statlas-content database
-        db = firestore.Client(project=project_id, database="statlas-content")
+        db = firestore.Client(project=project_id, database=DATABASE_NAME)
         collection = db.collection("countries")
+        
+        manifest = open_manifest(manifest_path)
+        imported_hashes = load_imported_hashes(manifest, project_id, DATABASE_NAME, collection)
     
     imported_count = 0
+    skipped_count = 0
+    pending = []
+    payload_hashes = {}
+    
+    # Timestamps are assigned by the server at commit time, avoiding client clock skew
+    now = firestore.SERVER_TIMESTAMP
     
     for country_data in SAMPLE_COUNTRIES:
         country_id = country_data["id"]
         
-        # Add timestamps
-        now = datetime.utcnow()
-        country_data["created_at"] = now
-        country_data["updated_at"] = now
-        
-        print(f"📍 {country_data['flag_emoji']} {country_data['name']} ({country_data['iso_alpha3']})")
-        print(f"   Capital: {country_data['capital']}")
-        print(f"   Population: {country_data['population']:,}")
-        print(f"   Area: {country_data['area_km2']:,} km²")
-        
         if not dry_run:
-            try:
-                # Check if country already exists
-                doc_ref = collection.document(country_id)
-                doc = doc_ref.get()
-                
-                if doc.exists:
-                    print(f"   ⚠️  Country {country_id} already exists, updating...")
-                    country_data["updated_at"] = now
-                    # Keep original created_at
-                    existing_data = doc.to_dict()
-                    country_data["created_at"] = existing_data.get("created_at", now)
-                else:
-                    print(f"   ✅ Creating new country {country_id}")
-                
-                doc_ref.set(country_data)
-                imported_count += 1
-                
-            except Exception as e:
-                print(f"   ❌ Error importing {country_id}: {e}")
+            # Skip countries whose content hasn't changed since they were last imported
+            payload_hashes[country_id] = payload_hash(country_data)
+            if not force and imported_hashes.get(country_id) == payload_hashes[country_id]:
+                if verbose:
+                    print(f"⏭️  {country_id} unchanged since last import, skipping")
+                skipped_count += 1
                 continue
+        
+        if not dry_run:
+            # Fresh payload with timestamps, leaving the sample record untouched
+            payload = {**country_data, "created_at": now, "updated_at": now}
+            pending.append((collection.document(country_id), payload))
         else:
-            print(f"   🔍 Would import {country_id}")
             imported_count += 1
         
-        print()
+        if verbose:
+            # One buffered write per country rather than a print() per line
+            sys.stdout.write(
+                f"📍 {country_data['flag_emoji']} {country_data['name']} ({country_data['iso_alpha3']})\n"
+                f"   Capital: {country_data['capital']}\n"
+                f"   Population: {country_data['population']:,}\n"
+                f"   Area: {country_data['area_km2']:,} km²\n"
+                + (f"   🔍 Would import {country_id}\n" if dry_run else "")
+                + "\n"
+            )
+    
+    if not dry_run and pending:
+        # Commit mini-batches concurrently; each worker writes one batch
+        chunks = [pending[i:i + MINIBATCH_SIZE] for i in range(0, len(pending), MINIBATCH_SIZE)]
+        rate_limiter = WriteRateLimiter()
+        with ThreadPool(processes=max_workers) as pool:
+            written_ids = [
+                country_id
+                for chunk_ids in pool.map(partial(write_minibatch, db, rate_limiter, verbose=verbose), chunks)
+                for country_id in chunk_ids
+            ]
+        imported_count += len(written_ids)
         
-        # Small delay to avoid overwhelming Firestore
-        if not dry_run:
-            time.sleep(0.1)
+        # Record only what was actually committed
+        record_imported(manifest, project_id, DATABASE_NAME, "countries",
+                        {country_id: payload_hashes[country_id] for country_id in written_ids})
+        print()
     
     print(f"✅ Import complete!")
     print(f"📊 Countries processed: {imported_count}/{len(SAMPLE_COUNTRIES)}")
+    if skipped_count:
+        print(f"⏭️  Countries unchanged and skipped: {skipped_count}")
     
     if not dry_run:
         print()
         print("🔍 Verifying import...")
         try:
-            docs = collection.where("is_active", "==", True).limit(10).get()
-            print(f"✅ Found {len(docs)} active countries in database")
+            # Count server-side instead of downloading documents
+            result = collection.where(filter=FieldFilter("is_active", "==", True)).count().get()
+            print(f"✅ Found {result[0][0].value} active countries in database")
         except Exception as e:
             print(f"⚠️  Verification failed: {e}")
 
@@ -203,11 +138,18 @@ def main():
     parser = argparse.ArgumentParser(description="Import sample countries to statlas-content database")
     parser.add_argument("--project-id", required=True, help="Google Cloud project ID")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be imported without actually importing")
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS,
+                        help=f"Mini-batch commits kept in flight concurrently (default: {MAX_WORKERS})")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH,
+                        help=f"SQLite manifest of already-imported documents (default: {DEFAULT_MANIFEST_PATH})")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-import every document, even if unchanged since the last import")
+    parser.add_argument("--verbose", action="store_true", help="Print details for every document")
     
     args = parser.parse_args()
     
     try:
-        import_countries(args.project_id, args.dry_run)
+        import_countries(args.project_id, args.dry_run, args.max_workers, args.manifest, args.force, args.verbose)
     except Exception as e:
         print(f"❌ Import failed: {e}")
         sys.exit(1)
@@ -14,16 +14,68 @@ Options:
 """
 
 import argparse
+import gzip
 import logging
+from google.api_core import exceptions, retry
 from google.cloud import firestore
 from google.cloud import storage
-import json
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.field_path import FieldPath
+import orjson
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# BulkWriter ramps up from 500 deletes/s (the 500/50/5 rule) to Firestore's
+# recommended 10k writes/s ceiling
+INITIAL_DELETES_PER_SECOND = 500
+MAX_DELETES_PER_SECOND = 10000
+
+# Collections purged concurrently; they share the write rate ceiling above
+MAX_PARALLEL_COLLECTIONS = 5
+
+# Exponential backoff for transient errors on reads outside the BulkWriter,
+# which has its own retries
+FIRESTORE_RETRY = retry.Retry(predicate=retry.if_transient_error, initial=1.0, maximum=30.0,
+                              multiplier=2.0, timeout=300.0)
+
+# Keys per page when counting without the count() aggregation
+COUNT_PAGE_SIZE = 1000
+
+# Documents between progress log lines
+PROGRESS_INTERVAL = 500
+
+# Attempts per delete before BulkWriter gives up on it
+MAX_DELETE_ATTEMPTS = 15
+
+# Documents per backup object; a part's documents are only deleted once the
+# part has been uploaded
+BACKUP_PART_SIZE = 10000
+
+# Parts buffered between the Firestore reader and the backup uploader
+BACKUP_QUEUE_PARTS = 2
+
+# Document keys buffered between the Firestore reader and the BulkWriter
+DELETE_QUEUE_SIZE = 5000
+
+def _json_default(value):
+    """Serialize Firestore value types that orjson doesn't handle natively"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, firestore.GeoPoint):
+        return {'latitude': value.latitude, 'longitude': value.longitude}
+    if isinstance(value, DocumentReference):
+        return value.path
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
 class GADMDataPurger:
     def __init__(self, dry_run=False, backup=False):
         self.dry_run = dry_run
@@ -33,6 +85,9 @@ class GADMDataPurger:
             self.storage_client = storage.Client()
             self.bucket_name = 'statlas-content-backups'
         
+        # Collections being purged at once, splitting the delete rate between them
+        self.concurrent_collections = 1
+        
         # GADM collections to purge
         self.gadm_collections = [
             'admin_level_1',
@@ -42,45 +97,201 @@ class GADMDataPurger:
             'admin_level_5'
         ]
     
+    def _count_documents_paginated(self, collection_name):
+        """Count documents by paging through keys only, for when count() is unavailable"""
+        query = (self.db.collection(collection_name)
+                 .select([])
+                 .order_by(FieldPath.document_id())
+                 .limit(COUNT_PAGE_SIZE))
+        count = 0
+        last_doc = None
+        
+        # Cursor pages keep memory bounded and avoid one long-running stream
+        while True:
+            page_query = query.start_after(last_doc) if last_doc is not None else query
+            page = list(page_query.stream(retry=FIRESTORE_RETRY))
+            count += len(page)
+            if len(page) < COUNT_PAGE_SIZE:
+                return count
+            last_doc = page[-1]
+    
     def count_documents_in_collection(self, collection_name):
         """Count total documents in a collection"""
         try:
-            docs = list(self.db.collection(collection_name).stream())
-            return len(docs)
-        except Exception as e:
+            try:
+                # Server-side aggregation: one RPC, no document reads
+                result = self.db.collection(collection_name).count().get(retry=FIRESTORE_RETRY)
+                return result[0][0].value
+            except (AttributeError, exceptions.MethodNotImplemented):
+                # Older client libraries or emulators without aggregation queries
+                return self._count_documents_paginated(collection_name)
+        except exceptions.GoogleAPIError as e:
             logging.warning(f"Could not count documents in {collection_name}: {e}")
             return 0
     
-    def backup_collection(self, collection_name):
-        """Backup collection to Cloud Storage"""
-        if not self.backup:
-            return
-            
-        logging.info(f"📦 Backing up {collection_name} to Cloud Storage...")
+    def _open_bulk_writer(self, failed):
+        """Create a rate-limited BulkWriter for deletes, collecting permanent failures in failed"""
+        # BulkWriter keeps many deletes in flight, throttling and retrying
+        # itself, instead of committing one batch at a time
+        bulk_writer = self.db.bulk_writer(options=BulkWriterOptions(
+            initial_ops_per_second=max(1, INITIAL_DELETES_PER_SECOND // self.concurrent_collections),
+            max_ops_per_second=max(1, MAX_DELETES_PER_SECOND // self.concurrent_collections)
+        ))
+        
+        def on_delete_error(error, _bulk_writer):
+            if error.attempts < MAX_DELETE_ATTEMPTS:
+                return True
+            failed.append(error)
+            return False
+        
+        bulk_writer.on_write_error(on_delete_error)
+        return bulk_writer
+    
+    def _close_bulk_writer(self, bulk_writer, failed, collection_name):
+        """Wait for queued deletes to finish, returning how many failed"""
+        bulk_writer.close()
+        
+        if failed:
+            logging.error(f"   ❌ {len(failed)} deletes failed in {collection_name}, e.g. {failed[0].operation.reference.id}: {failed[0].message}")
+        return len(failed)
+    
+    def _serialize_backup_part(self, docs):
+        """Encode documents as gzipped JSON Lines"""
+        # JSON compresses well, so gzip cuts upload time and storage
+        lines = []
+        for doc in docs:
+            doc_data = doc.to_dict()
+            doc_data['_firestore_id'] = doc.id
+            lines.append(orjson.dumps(doc_data, default=_json_default, option=orjson.OPT_APPEND_NEWLINE))
+        return gzip.compress(b''.join(lines))
+    
+    def _upload_backup_part(self, bucket, blob_name, data):
+        """Upload one encoded backup part to Cloud Storage"""
+        blob = bucket.blob(blob_name)
+        blob.content_encoding = 'gzip'
+        blob.upload_from_string(data, content_type='application/x-ndjson')
+    
+    def backup_and_delete_collection(self, collection_name):
+        """Backup collection to Cloud Storage and delete it in a single read pass"""
+        logging.info(f"📦 Backing up and {'[DRY RUN] ' if self.dry_run else ''}deleting documents from {collection_name}...")
         
         try:
             # Get bucket
             bucket = self.storage_client.bucket(self.bucket_name)
             
-            # Create backup filename
+            # Create backup prefix
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_filename = f"gadm_purge_backup/{collection_name}_{timestamp}.json"
+            backup_prefix = f"gadm_purge_backup/{collection_name}_{timestamp}"
             
-            # Collect all documents
-            docs = []
-            for doc in self.db.collection(collection_name).stream():
-                doc_data = doc.to_dict()
-                doc_data['_firestore_id'] = doc.id
-                docs.append(doc_data)
+            failed = []
+            bulk_writer = None if self.dry_run else self._open_bulk_writer(failed)
             
-            if docs:
-                # Upload to Cloud Storage
-                blob = bucket.blob(backup_filename)
-                blob.upload_from_string(json.dumps(docs, indent=2))
-                logging.info(f"   ✅ Backed up {len(docs)} documents to gs://{self.bucket_name}/{backup_filename}")
-            else:
-                logging.info(f"   ⚠️  No documents to backup in {collection_name}")
+            deleted_count = 0
+            try:
+                # Three stages, each on its own thread: this thread reads from
+                # Firestore, a serializer encodes each part, and an uploader sends
+                # it to Cloud Storage, so CPU-bound encoding never stalls either
+                # network stream. Bounded queues between stages cap memory.
+                parts = queue.Queue(maxsize=BACKUP_QUEUE_PARTS)
+                encoded_parts = queue.Queue(maxsize=BACKUP_QUEUE_PARTS)
+                stopped = threading.Event()
+                
+                def put(stage_queue, item):
+                    # Give up once any stage has failed rather than block forever
+                    while not stopped.is_set():
+                        try:
+                            stage_queue.put(item, timeout=1)
+                            return
+                        except queue.Full:
+                            pass
+                
+                def get(stage_queue):
+                    # Treat a failed stage like the end of input
+                    while not stopped.is_set():
+                        try:
+                            return stage_queue.get(timeout=1)
+                        except queue.Empty:
+                            pass
+                    return None
+                
+                def serialize_worker():
+                    """Encode queued parts, passing their document keys along for deletion"""
+                    try:
+                        while True:
+                            docs = get(parts)
+                            if docs is None:
+                                return
+                            put(encoded_parts, ([doc.reference for doc in docs], self._serialize_backup_part(docs)))
+                    except BaseException:
+                        stopped.set()
+                        raise
+                    finally:
+                        put(encoded_parts, None)
+                
+                def upload_worker():
+                    """Upload encoded parts, deleting each part's documents once it is stored"""
+                    try:
+                        backed_up = 0
+                        part_number = 0
+                        while True:
+                            encoded = get(encoded_parts)
+                            if encoded is None:
+                                return backed_up
+                            
+                            refs, data = encoded
+                            blob_name = f"{backup_prefix}/part-{part_number:05d}.jsonl.gz"
+                            self._upload_backup_part(bucket, blob_name, data)
+                            part_number += 1
+                            backed_up += len(refs)
+                            
+                            if bulk_writer is not None:
+                                for ref in refs:
+                                    bulk_writer.delete(ref)
+                            
+                            logging.info(f"   📊 Backed up {backed_up:,} documents{'' if bulk_writer is None else ' and queued their deletes'}")
+                    except BaseException:
+                        stopped.set()
+                        raise
+                
+                # Each document is read only once for both backup and deletion
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    serialize_future = executor.submit(serialize_worker)
+                    upload_future = executor.submit(upload_worker)
+                    
+                    try:
+                        part = []
+                        for doc in self.db.collection(collection_name).stream(retry=FIRESTORE_RETRY):
+                            part.append(doc)
+                            if len(part) == BACKUP_PART_SIZE:
+                                put(parts, part)
+                                part = []
+                                if stopped.is_set():
+                                    break
+                        if part:
+                            put(parts, part)
+                    except BaseException:
+                        stopped.set()
+                        raise
+                    finally:
+                        put(parts, None)
+                    
+                    serialize_future.result()
+                    backed_up = upload_future.result()
                 
+                if backed_up == 0:
+                    logging.info(f"   ⚠️  No documents to backup in {collection_name}")
+                    return 0
+                
+                logging.info(f"   ✅ Backed up {backed_up} documents to gs://{self.bucket_name}/{backup_prefix}/")
+                deleted_count = backed_up
+            finally:
+                if bulk_writer is not None:
+                    # Flush deletes already queued even if a stage failed
+                    deleted_count -= self._close_bulk_writer(bulk_writer, failed, collection_name)
+            
+            logging.info(f"   ✅ {'Would delete' if self.dry_run else 'Deleted'} {deleted_count} documents from {collection_name}")
+            return deleted_count
+            
         except Exception as e:
             logging.error(f"   ❌ Backup failed for {collection_name}: {e}")
             raise
@@ -91,33 +302,65 @@ class GADMDataPurger:
         
         try:
             collection_ref = self.db.collection(collection_name)
-            docs = list(collection_ref.stream())
+            deleted_count = 0
+            failed = []
+            bulk_writer = None if self.dry_run else self._open_bulk_writer(failed)
             
-            if not docs:
-                logging.info(f"   ✅ Collection {collection_name} is already empty")
-                return 0
+            # A reader thread keeps the Firestore stream moving while the
+            # BulkWriter is throttled; the bounded queue caps memory regardless
+            # of collection size
+            refs = queue.Queue(maxsize=DELETE_QUEUE_SIZE)
+            stopped = threading.Event()
             
-            deleted_count = 0
-            batch_size = 500  # Firestore batch limit
+            def put_ref(item):
+                # Give up once the consumer has stopped rather than block forever
+                while not stopped.is_set():
+                    try:
+                        refs.put(item, timeout=1)
+                        return True
+                    except queue.Full:
+                        pass
+                return False
             
-            # Process in batches
-            for i in range(0, len(docs), batch_size):
-                batch = self.db.batch()
-                batch_docs = docs[i:i + batch_size]
-                
-                for doc in batch_docs:
-                    if not self.dry_run:
-                        batch.delete(doc.reference)
-                    deleted_count += 1
-                
-                if not self.dry_run:
-                    batch.commit()
-                    
-                logging.info(f"   📊 {'Would delete' if self.dry_run else 'Deleted'} batch {i//batch_size + 1}: {len(batch_docs)} documents")
+            def read_refs():
+                """Stream document keys into the queue, ending with None"""
+                try:
+                    # The empty projection returns only document keys
+                    for doc in collection_ref.select([]).stream(retry=FIRESTORE_RETRY):
+                        if not put_ref(doc.reference):
+                            return
+                finally:
+                    put_ref(None)
+            
+            # BulkWriter isn't safe for concurrent callers, so this thread is
+            # the only one queueing deletes
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                reader = executor.submit(read_refs)
+                try:
+                    while True:
+                        ref = refs.get()
+                        if ref is None:
+                            break
+                        
+                        if bulk_writer is not None:
+                            bulk_writer.delete(ref)
+                        deleted_count += 1
+                        
+                        if deleted_count % PROGRESS_INTERVAL == 0:
+                            logging.info(f"   📊 {'Would delete' if self.dry_run else 'Queued'} {deleted_count:,} documents")
+                except BaseException:
+                    stopped.set()
+                    raise
                 
-                # Small delay between batches
-                if not self.dry_run:
-                    time.sleep(0.1)
+                # Surface any error from the reader
+                reader.result()
+            
+            if bulk_writer is not None:
+                deleted_count -= self._close_bulk_writer(bulk_writer, failed, collection_name)
+            
+            if deleted_count == 0 and not failed:
+                logging.info(f"   ✅ Collection {collection_name} is already empty")
+                return 0
             
             logging.info(f"   ✅ {'Would delete' if self.dry_run else 'Deleted'} {deleted_count} documents from {collection_name}")
             return deleted_count
@@ -150,6 +393,18 @@ class GADMDataPurger:
         
         return total_docs, collection_stats
     
+    def _process_collection(self, collection):
+        """Purge a single collection, backing it up first if requested"""
+        try:
+            # Backup alongside deletion if requested
+            if self.backup:
+                return self.backup_and_delete_collection(collection)
+            return self.delete_collection_documents(collection)
+            
+        except Exception as e:
+            logging.error(f"❌ Failed to process {collection}: {e}")
+            raise
+    
     def purge_gadm_data(self):
         """Main purge operation"""
         logging.info("🧹 GADM DATA PURGE OPERATION")
@@ -157,6 +412,7 @@ class GADMDataPurger:
         
         # Get summary
         total_docs, collection_stats = self.get_purge_summary()
+        active_collections = [c for c in self.gadm_collections if collection_stats[c] > 0]
         
         if total_docs == 0:
             logging.info("✅ No GADM data found to purge. Database is already clean.")
@@ -172,27 +428,20 @@ class GADMDataPurger:
         
         total_deleted = 0
         
-        for collection in self.gadm_collections:
-            if collection_stats[collection] > 0:
-                try:
-                    # Backup first if requested
-                    if self.backup:
-                        self.backup_collection(collection)
-                    
-                    # Delete documents
-                    deleted = self.delete_collection_documents(collection)
-                    total_deleted += deleted
-                    
-                except Exception as e:
-                    logging.error(f"❌ Failed to process {collection}: {e}")
-                    raise
+        # Collections are independent, so purge them concurrently
+        self.concurrent_collections = min(len(active_collections), MAX_PARALLEL_COLLECTIONS)
+        
+        with ThreadPoolExecutor(max_workers=self.concurrent_collections) as executor:
+            futures = [executor.submit(self._process_collection, collection) for collection in active_collections]
+            for future in as_completed(futures):
+                total_deleted += future.result()
         
         # Summary
         duration = time.time() - start_time
         logging.info("\n🎯 PURGE OPERATION COMPLETE")
         logging.info("=" * 50)
         logging.info(f"   {'Would delete' if self.dry_run else 'Deleted'}: {total_deleted:,} documents")
-        logging.info(f"   Collections processed: {len([c for c in self.gadm_collections if collection_stats[c] > 0])}")
+        logging.info(f"   Collections processed: {len(active_collections)}")
         logging.info(f"   Duration: {duration:.1f} seconds")
         
         if self.backup and not self.dry_run:
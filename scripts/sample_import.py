@@ -0,0 +1,155 @@
+"""
+Shared write machinery for the sample data importers.
+
+import_sample_countries.py and import_sample_landmarks.py both write small
+collections of sample documents; the rate limiting, mini-batch commits and
+local skip manifest they share live here.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Mapping
+import orjson
+from google.api_core import exceptions, retry
+
+# Local record of what has already been imported per project and database, so
+# unchanged documents can be skipped on reruns without rewriting them
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.expanduser("~"), ".cache", "statlas", "import_manifest.sqlite")
+
+# Documents per batched write, and how many batches are committed concurrently
+MINIBATCH_SIZE = 50
+MAX_WORKERS = 10
+
+# Firestore write throughput: start at 500 writes/s and grow 50% every 5 minutes
+# (the "500/50/5" ramp-up rule), capped at the 10,000 writes/s database limit
+INITIAL_WRITES_PER_SECOND = 500
+MAX_WRITES_PER_SECOND = 10000
+RAMP_UP_INTERVAL_SECONDS = 300
+
+# Batch commits are atomic, so contention aborts and transient outages are safe to retry
+COMMIT_RETRY = retry.Retry(predicate=retry.if_exception_type(exceptions.Aborted, exceptions.ServiceUnavailable))
+
+class WriteRateLimiter:
+    """Token bucket shared by the write workers, following the 500/50/5 ramp-up rule."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = self._last_refill = time.monotonic()
+        self._tokens = float(INITIAL_WRITES_PER_SECOND)
+
+    def _current_rate(self, now: float) -> float:
+        ramp_steps = int((now - self._start) // RAMP_UP_INTERVAL_SECONDS)
+        return min(MAX_WRITES_PER_SECOND, INITIAL_WRITES_PER_SECOND * 1.5 ** ramp_steps)
+
+    def acquire(self, writes: int):
+        """Block until `writes` operations may be sent."""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                rate = self._current_rate(now)
+                self._tokens = min(rate, self._tokens + (now - self._last_refill) * rate)
+                self._last_refill = now
+
+                if self._tokens >= writes:
+                    self._tokens -= writes
+                    return
+
+                time.sleep((writes - self._tokens) / rate)
+
+def open_manifest(manifest_path: str) -> sqlite3.Connection:
+    """Open the import manifest, creating it if needed."""
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    manifest = sqlite3.connect(manifest_path)
+    # Keyed by project and database too, so an import into one database never
+    # makes a run against another skip its documents
+    manifest.execute(
+        "CREATE TABLE IF NOT EXISTS imported_documents ("
+        "project_id TEXT NOT NULL, database TEXT NOT NULL, collection TEXT NOT NULL, "
+        "id TEXT NOT NULL, payload_hash TEXT NOT NULL, "
+        "PRIMARY KEY (project_id, database, collection, id))"
+    )
+    return manifest
+
+def load_imported_hashes(manifest: sqlite3.Connection, project_id: str, database: str,
+                         collection_ref) -> Dict[str, str]:
+    """Return {document ID: payload hash} for recorded imports that still exist in Firestore.
+
+    Existence is checked with a single ID-only query, so documents deleted on
+    the server since they were imported are written again.
+    """
+    recorded = dict(manifest.execute(
+        "SELECT id, payload_hash FROM imported_documents WHERE project_id = ? AND database = ? AND collection = ?",
+        (project_id, database, collection_ref.id)
+    ))
+    if not recorded:
+        return recorded
+
+    existing = {snapshot.id for snapshot in collection_ref.select([]).stream()}
+    return {doc_id: content_hash for doc_id, content_hash in recorded.items() if doc_id in existing}
+
+def record_imported(manifest: sqlite3.Connection, project_id: str, database: str, collection: str,
+                    payload_hashes: Mapping[str, str]):
+    """Record the given {document ID: payload hash} pairs as imported into collection."""
+    with manifest:
+        manifest.executemany(
+            "INSERT OR REPLACE INTO imported_documents (project_id, database, collection, id, payload_hash) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(project_id, database, collection, doc_id, content_hash) for doc_id, content_hash in payload_hashes.items()]
+        )
+
+def payload_hash(data: Mapping) -> str:
+    """Hash a document's content, ignoring the timestamps added at import time."""
+    content = {key: value for key, value in data.items() if key not in ("created_at", "updated_at")}
+    return hashlib.blake2b(orjson.dumps(content, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+def _upsert_document(rate_limiter: WriteRateLimiter, doc_ref, data, verbose: bool = False) -> bool:
+    """Create a single document, updating it in place (keeping created_at) if it already exists."""
+    path = f"{doc_ref.parent.id}/{doc_ref.id}"
+    try:
+        rate_limiter.acquire(1)
+        try:
+            doc_ref.create(data, retry=COMMIT_RETRY)
+            if verbose:
+                print(f"   ✅ Created new document {path}")
+        except exceptions.AlreadyExists:
+            if verbose:
+                print(f"   ⚠️  Document {path} already exists, updating...")
+            # Keep original created_at
+            update_data = {key: value for key, value in data.items() if key != "created_at"}
+            doc_ref.set(update_data, merge=True, retry=COMMIT_RETRY)
+        return True
+    except Exception as e:
+        print(f"❌ Error writing document {path}: {e}")
+        return False
+
+def write_minibatch(db, rate_limiter: WriteRateLimiter, chunk, verbose: bool = False) -> List[str]:
+    """Write a mini-batch of (doc_ref, data) pairs in a single commit, returning the IDs written.
+
+    Per-batch and per-document progress is printed only when verbose; errors always are.
+    """
+    collection = chunk[0][0].parent.id
+
+    # Create the whole chunk without reading first; the server rejects the batch
+    # if any document already exists, in which case fall back to per-document
+    # upserts for this chunk only
+    batch = db.batch()
+    for doc_ref, data in chunk:
+        batch.create(doc_ref, data)
+
+    try:
+        rate_limiter.acquire(len(chunk))
+        batch.commit(retry=COMMIT_RETRY)
+        if verbose:
+            print(f"📤 Committed batch of {len(chunk)} new {collection}")
+        return [doc_ref.id for doc_ref, _ in chunk]
+    except exceptions.AlreadyExists:
+        if verbose:
+            print(f"   ⚠️  Batch of {len(chunk)} {collection} includes existing documents, writing individually...")
+    except Exception as e:
+        print(f"❌ Error committing batch of {len(chunk)} {collection}: {e}")
+        return []
+
+    return [doc_ref.id for doc_ref, data in chunk if _upsert_document(rate_limiter, doc_ref, data, verbose)]
@@ -15,16 +15,20 @@ Requirements:
 - gcloud CLI configured with appropriate permissions
 
 Usage:
-    python setup_flag_assets.py --project-id statlas-467715 [--dry-run]
+    python setup_flag_assets.py --project-id statlas-467715 [--dry-run] [--mapping-cache PATH]
 """
 
 import argparse
+import base64
+import hashlib
 import json
 import os
 import sys
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 
 # Configure logging
@@ -32,19 +36,42 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 try:
+    from google.api_core import retry
     from google.cloud import storage
     from google.cloud import firestore
+    from google.cloud.exceptions import Conflict
+    from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriterOptions
     DEPENDENCIES_AVAILABLE = True
+    
+    # Exponential backoff for transient errors on reads outside the BulkWriter,
+    # which has its own retries
+    FIRESTORE_RETRY = retry.Retry(predicate=retry.if_transient_error, initial=1.0, maximum=30.0,
+                                  multiplier=2.0, timeout=300.0)
 except ImportError as e:
     logger.error(f"Missing dependencies: {e}")
     logger.error("Install with: pip install google-cloud-storage google-cloud-firestore")
     DEPENDENCIES_AVAILABLE = False
 
+# Concurrent flag uploads; each file is small, so uploads are latency-bound
+MAX_UPLOAD_WORKERS = 32
+
+# Attempts per country update before BulkWriter gives up on it; kept low
+# since retries back off exponentially
+MAX_UPDATE_ATTEMPTS = 5
+
+# gRPC status codes worth retrying: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED,
+# ABORTED, INTERNAL, UNAVAILABLE; anything else (e.g. NOT_FOUND) fails at once
+TRANSIENT_WRITE_ERRORS = frozenset({4, 8, 10, 13, 14})
+
+# How long a local country ISO mapping snapshot stays valid
+MAPPING_CACHE_TTL_SECONDS = 24 * 60 * 60
+
 
 class FlagAssetManager:
     """Manages flag assets for Statlas platform."""
     
-    def __init__(self, project_id: str, bucket_name: str = "statlas-flag-assets"):
+    def __init__(self, project_id: str, bucket_name: str = "statlas-flag-assets",
+                 mapping_cache: Optional[str] = None):
         """Initialize the flag asset manager."""
         if not DEPENDENCIES_AVAILABLE:
             raise ImportError("Required dependencies not available")
@@ -59,6 +86,10 @@ class FlagAssetManager:
         self.flagkit_png_path = Path("../flagkit-assets/Assets/PNG")
         self.cdn_base_url = "https://cdn.statlas.app/flags"
         
+        # Country ISO mappings, fetched once per run (optionally snapshotted locally)
+        self.mapping_cache = Path(mapping_cache).expanduser() if mapping_cache else None
+        self._country_mappings: Optional[Dict[str, str]] = None
+        
         logger.info(f"Initialized FlagAssetManager for project: {project_id}")
     
     def create_storage_bucket(self, location: str = "US", dry_run: bool = False) -> bool:
@@ -70,14 +101,13 @@ class FlagAssetManager:
             return True
         
         try:
-            # Check if bucket already exists
-            bucket = self.storage_client.bucket(self.bucket_name)
-            if bucket.exists():
+            # Create bucket; an existing bucket is reported as a conflict,
+            # which saves a separate exists() round trip
+            try:
+                bucket = self.storage_client.create_bucket(self.bucket_name, location=location)
+            except Conflict:
                 logger.info(f"Bucket {self.bucket_name} already exists")
                 return True
-            
-            # Create bucket
-            bucket = self.storage_client.create_bucket(self.bucket_name, location=location)
             logger.info(f"Created bucket: {bucket.name}")
             
             # Configure bucket for public read access
@@ -104,41 +134,79 @@ class FlagAssetManager:
             logger.error(f"Failed to create bucket: {e}")
             return False
     
-    def get_available_flags(self) -> Dict[str, Dict[str, Path]]:
+    def get_available_flags(self) -> Dict[str, Dict[str, str]]:
         """Get list of available flag files from FlagKit (SVG and PNG)."""
         if not self.flagkit_svg_path.exists():
             raise FileNotFoundError(f"FlagKit SVG path not found: {self.flagkit_svg_path}")
         if not self.flagkit_png_path.exists():
             raise FileNotFoundError(f"FlagKit PNG path not found: {self.flagkit_png_path}")
         
-        flags = {}
+        flags = defaultdict(dict)
+        
+        # One scandir pass per directory, keeping plain string paths rather
+        # than building a Path object for every file
         
         # Get SVG files
-        for svg_file in self.flagkit_svg_path.glob("*.svg"):
-            iso_code = svg_file.stem.upper()
-            if iso_code not in flags:
-                flags[iso_code] = {}
-            flags[iso_code]['svg'] = svg_file
+        with os.scandir(self.flagkit_svg_path) as entries:
+            for entry in entries:
+                if entry.name.endswith(".svg"):
+                    flags[entry.name[:-4].upper()]['svg'] = entry.path
         
         # Get PNG files (all resolutions)
-        for png_file in self.flagkit_png_path.glob("*.png"):
-            filename = png_file.stem
-            if '@' in filename:
-                # Handle @2x, @3x resolutions
-                iso_code, resolution = filename.split('@', 1)
-                iso_code = iso_code.upper()
-                resolution_key = f"png_{resolution}"
-            else:
-                # Handle 1x resolution
-                iso_code = filename.upper()
-                resolution_key = "png"
-            
-            if iso_code not in flags:
-                flags[iso_code] = {}
-            flags[iso_code][resolution_key] = png_file
+        with os.scandir(self.flagkit_png_path) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".png"):
+                    continue
+                
+                # Handle 1x resolution (no suffix) and @2x, @3x resolutions
+                iso_code, _, resolution = entry.name[:-4].partition('@')
+                resolution_key = f"png_{resolution}" if resolution else "png"
+                flags[iso_code.upper()][resolution_key] = entry.path
         
         logger.info(f"Found {len(flags)} countries with flag assets")
-        return flags
+        return dict(flags)
+    
+    def get_existing_flags(self, bucket) -> Dict[str, Tuple[str, int]]:
+        """Get (md5_hash, generation) of every uploaded flag from a single listing."""
+        return {
+            blob.name: (blob.md5_hash, blob.generation)
+            for blob in bucket.list_blobs(prefix="flags/", fields="items(name,md5Hash,generation),nextPageToken")
+        }
+    
+    def _upload_flag(self, bucket, existing_flags: Dict[str, Tuple[str, int]], iso_code: str,
+                     format_key: str, flag_path: str, blob_name: str,
+                     content_type: str) -> Optional[Tuple[str, bool]]:
+        """Upload a single flag file unless unchanged, returning (public URL, uploaded) or None on failure."""
+        try:
+            public_url = f"{self.cdn_base_url}/{blob_name.replace('flags/', '')}"
+            
+            # Skip files whose content already matches the uploaded object
+            with open(flag_path, 'rb') as f:
+                data = f.read()
+            local_md5 = base64.b64encode(hashlib.md5(data).digest()).decode()
+            existing_md5, generation = existing_flags.get(blob_name, (None, 0))
+            if local_md5 == existing_md5:
+                logger.debug(f"Unchanged: {iso_code} {format_key} -> {public_url}")
+                return public_url, False
+            
+            # Set content type and cache control up front so they are
+            # sent with the upload rather than in a separate patch
+            blob = bucket.blob(blob_name)
+            blob.content_type = content_type
+            blob.cache_control = "public, max-age=86400"  # 24 hours
+            
+            # Upload the bytes already read, as a single multipart request (flags
+            # are far below the resumable threshold), only if the object is
+            # still the one listed (or still absent, generation 0) so
+            # concurrent runs can't clobber it
+            blob.upload_from_string(data, content_type=content_type, if_generation_match=generation)
+            
+            logger.info(f"Uploaded: {iso_code} {format_key} -> {public_url}")
+            return public_url, True
+            
+        except Exception as e:
+            logger.error(f"Failed to upload {iso_code} {format_key}: {e}")
+            return None
     
     def upload_flag_assets(self, dry_run: bool = False) -> Dict[str, str]:
         """Upload flag assets (SVG and PNG) to Cloud Storage."""
@@ -148,6 +216,8 @@ class FlagAssetManager:
         bucket = self.storage_client.bucket(self.bucket_name)
         uploaded_urls = {}
         total_uploads = 0
+        unchanged = 0
+        uploads: List[Tuple[str, str, str, str, str]] = []
         
         for iso_code, flag_formats in available_flags.items():
             for format_key, flag_path in flag_formats.items():
@@ -169,40 +239,73 @@ class FlagAssetManager:
                     continue  # Skip unknown formats
                 
                 if dry_run:
-                    logger.info(f"[DRY RUN] Would upload {flag_path.name} -> {blob_name}")
+                    logger.info(f"[DRY RUN] Would upload {os.path.basename(flag_path)} -> {blob_name}")
                     total_uploads += 1
                     continue
                 
-                try:
-                    # Upload file
-                    blob = bucket.blob(blob_name)
-                    blob.upload_from_filename(str(flag_path))
-                    
-                    # Set content type and cache control
-                    blob.content_type = content_type
-                    blob.cache_control = "public, max-age=86400"  # 24 hours
-                    blob.patch()
-                    
-                    # Generate public URL (only track SVG URLs for country updates)
-                    public_url = f"{self.cdn_base_url}/{blob_name.replace('flags/', '')}"
-                    if format_key == 'svg':
-                        uploaded_urls[iso_code] = public_url
-                    
-                    logger.info(f"Uploaded: {iso_code} {format_key} -> {public_url}")
-                    total_uploads += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to upload {iso_code} {format_key}: {e}")
+                uploads.append((iso_code, format_key, flag_path, blob_name, content_type))
+        
+        existing_flags = self.get_existing_flags(bucket) if uploads else {}
         
-        logger.info(f"Upload complete: {total_uploads} files uploaded ({len(uploaded_urls)} SVG flags for country updates)")
+        # Upload concurrently; results come back in order, so no shared state is mutated
+        with ThreadPoolExecutor(max_workers=MAX_UPLOAD_WORKERS) as executor:
+            results = list(executor.map(lambda upload: self._upload_flag(bucket, existing_flags, *upload), uploads))
+        
+        for (iso_code, format_key, _, _, _), result in zip(uploads, results):
+            if result is None:
+                continue
+            
+            public_url, uploaded = result
+            
+            # Only track SVG URLs for country updates (unchanged flags included)
+            if format_key == 'svg':
+                uploaded_urls[iso_code] = public_url
+            if uploaded:
+                total_uploads += 1
+            else:
+                unchanged += 1
+        
+        logger.info(f"Upload complete: {total_uploads} files uploaded, {unchanged} unchanged ({len(uploaded_urls)} SVG flags for country updates)")
         return uploaded_urls
     
+    def _load_mapping_cache(self) -> Optional[Dict[str, str]]:
+        """Load the local country mapping snapshot if present and fresh."""
+        try:
+            with open(self.mapping_cache) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if time.time() - snapshot.get("fetched_at", 0) > MAPPING_CACHE_TTL_SECONDS:
+            return None
+        return snapshot.get("countries")
+    
+    def _save_mapping_cache(self, countries: Dict[str, str]):
+        """Write the local country mapping snapshot."""
+        try:
+            self.mapping_cache.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.mapping_cache, "w") as f:
+                json.dump({"fetched_at": time.time(), "countries": countries}, f)
+        except OSError as e:
+            logger.warning(f"Could not write mapping cache {self.mapping_cache}: {e}")
+    
     def get_country_iso_mappings(self) -> Dict[str, str]:
         """Get mapping of country IDs to ISO codes from Firestore."""
+        if self._country_mappings is not None:
+            return self._country_mappings
+        
+        if self.mapping_cache:
+            countries = self._load_mapping_cache()
+            if countries is not None:
+                logger.info(f"Loaded {len(countries)} country ISO code mappings from {self.mapping_cache}")
+                self._country_mappings = countries
+                return countries
+        
         logger.info("Fetching country ISO code mappings from Firestore")
         
         countries = {}
-        docs = self.firestore_client.collection("countries").stream()
+        # Only iso_alpha2 is needed, so skip the rest of each document
+        docs = self.firestore_client.collection("countries").select(["iso_alpha2"]).stream(retry=FIRESTORE_RETRY)
         
         for doc in docs:
             data = doc.to_dict()
@@ -213,6 +316,10 @@ class FlagAssetManager:
                 countries[country_id] = iso_alpha2
         
         logger.info(f"Found {len(countries)} countries with ISO codes")
+        
+        if self.mapping_cache:
+            self._save_mapping_cache(countries)
+        self._country_mappings = countries
         return countries
     
     def update_country_flag_urls(self, uploaded_flags: Dict[str, str], dry_run: bool = False) -> int:
@@ -221,6 +328,25 @@ class FlagAssetManager:
         
         country_mappings = self.get_country_iso_mappings()
         updated_count = 0
+        failed = []
+        
+        if not dry_run:
+            # BulkWriter sends the updates in parallel batches, retrying
+            # transient failures itself with exponential backoff, instead of
+            # one RPC at a time
+            collection = self.firestore_client.collection("countries")
+            bulk_writer = self.firestore_client.bulk_writer(
+                options=BulkWriterOptions(retry=BulkRetry.exponential)
+            )
+            
+            def on_update_error(error, _bulk_writer) -> bool:
+                if error.code in TRANSIENT_WRITE_ERRORS and error.attempts < MAX_UPDATE_ATTEMPTS:
+                    return True
+                logger.error(f"Failed to update {error.operation.reference.id}: {error.message}")
+                failed.append(error)
+                return False
+            
+            bulk_writer.on_write_error(on_update_error)
         
         for country_id, iso_code in country_mappings.items():
             if iso_code in uploaded_flags:
@@ -231,22 +357,22 @@ class FlagAssetManager:
                     updated_count += 1
                     continue
                 
-                try:
-                    # Update country document
-                    doc_ref = self.firestore_client.collection("countries").document(country_id)
-                    doc_ref.update({
-                        "flag_url": flag_url,
-                        "updated_at": firestore.SERVER_TIMESTAMP
-                    })
-                    
-                    logger.info(f"Updated {country_id} ({iso_code}) -> {flag_url}")
-                    updated_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to update {country_id}: {e}")
+                # Queue country document update
+                bulk_writer.update(collection.document(country_id), {
+                    "flag_url": flag_url,
+                    "updated_at": firestore.SERVER_TIMESTAMP
+                })
+                
+                logger.info(f"Queued update {country_id} ({iso_code}) -> {flag_url}")
+                updated_count += 1
             else:
                 logger.warning(f"No flag found for {country_id} ({iso_code})")
         
+        if not dry_run:
+            # Wait for all queued updates to be written
+            bulk_writer.close()
+            updated_count -= len(failed)
+        
         logger.info(f"Updated {updated_count} country flag URLs")
         return updated_count
     
@@ -355,11 +481,14 @@ def main():
                        help="Skip file upload (useful for testing)")
     parser.add_argument("--skip-firestore", action="store_true",
                        help="Skip Firestore updates")
+    parser.add_argument("--mapping-cache",
+                       help="Local JSON snapshot of country ISO mappings, reused for 24 hours "
+                            "(e.g. ~/.statlas_countries.json)")
     
     args = parser.parse_args()
     
     try:
-        manager = FlagAssetManager(args.project_id, args.bucket_name)
+        manager = FlagAssetManager(args.project_id, args.bucket_name, args.mapping_cache)
         
         # Step 1: Create storage bucket
         logger.info("Step 1: Creating storage bucket...")
@@ -10,75 +10,171 @@ Usage:
 """
 
 import argparse
+import hashlib
 import json
+import os
 import sys
-import time
-from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
+import logging.handlers
 
 try:
+    import orjson
+except ImportError:
+    orjson = None  # Fall back to the standard json parser
+
+try:
+    from google.api_core import retry
     from google.cloud import firestore
-    from google.cloud.firestore_v1 import FieldFilter
+    from google.cloud.firestore_v1 import CollectionReference, DocumentSnapshot, FieldFilter
+    from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriterOptions
 except ImportError:
     print("Error: google-cloud-firestore is required. Install with: pip install google-cloud-firestore")
     sys.exit(1)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging; records are buffered and written in batches of 128
+# (or immediately on errors, and at exit) instead of one write per line
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+logging.basicConfig(
+    level=logging.INFO,
+    handlers=[logging.handlers.MemoryHandler(capacity=128, target=_stream_handler)],
+)
 logger = logging.getLogger(__name__)
 
+# Attempts per write before BulkWriter gives up on it
+MAX_WRITE_ATTEMPTS = 5
+
+# gRPC status codes worth retrying: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED,
+# ABORTED, INTERNAL, UNAVAILABLE; anything else (e.g. NOT_FOUND) fails at once
+TRANSIENT_WRITE_ERRORS = frozenset({4, 8, 10, 13, 14})
+
+# Backoff for reads on transient errors (throttling, unavailability, aborts)
+FIRESTORE_RETRY = retry.Retry(predicate=retry.if_transient_error, initial=0.1, maximum=10.0,
+                              multiplier=2.0, timeout=60.0)
+
+# country_code -> payload hash of the last successful write, per project/database
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".update_cache.json")
+
+# Marks JSON fields that every country must provide
+_REQUIRED = object()
+
+# Firestore field, countries_info.json field, default when missing
+_SCHEMA = (
+    ("name", "country", _REQUIRED),
+    ("local_name", "local_name", ""),
+    ("country_code", "country_code", _REQUIRED),
+    ("continent", "continent", _REQUIRED),
+    ("capital", "capital", ""),
+    ("population", "population", 0),
+    ("area_sq_km", "area_sq_km", 0),
+    ("area_sq_mi", "area_sq_mi", 0),
+    ("coastline_km", "coastline_km", 0),
+    ("coastline_mi", "coastline_mi", 0),
+    ("government_form", "government_form", ""),
+    ("currency", "currency", ""),
+    ("currency_code", "currency_code", ""),
+    ("dialing_prefix", "dialing_prefix", ""),
+    ("birthrate", "birthrate", 0),
+    ("deathrate", "deathrate", 0),
+    ("url", "url", ""),
+)
+
+# Existing fields kept on update, since the JSON data doesn't provide them
+_PRESERVED_FIELDS = ("created_at", "flag_url", "flag_emoji", "bounds", "iso_alpha3", "iso_numeric", "languages")
+
+# Fields written from the JSON data and compared against the existing document
+# to skip no-op updates (updated_at always differs, so it is left out)
+_COMPARED_FIELDS = [dst for dst, _, _ in _SCHEMA] + ["id", "is_active"]
+
 class CountriesUpdater:
     """Updates countries in Firestore with comprehensive data from JSON."""
     
-    def __init__(self, project_id: str, database_id: str = "statlas-content"):
+    def __init__(self, project_id: str, database_id: str = "statlas-content",
+                 cache_path: Optional[str] = DEFAULT_CACHE_PATH):
         """Initialize the countries updater.
         
         Args:
             project_id: Google Cloud project ID
             database_id: Firestore database ID
+            cache_path: Local cache of already-written payload hashes, or None to disable it
         """
         self.project_id = project_id
         self.database_id = database_id
         self.db = firestore.Client(project=project_id, database=database_id)
         self.collection = self.db.collection("countries")
+        self.map_units_collection = self.db.collection("map_units")
+        
+        # iso_alpha2 -> (doc_snapshot, collection_ref), filled by _build_index()
+        self._index: Dict[str, Tuple] = {}
+        
+        # Writes confirmed by the last BulkWriter run; None until one has run
+        self._written_count: Optional[int] = None
+        
+        self.cache_path = cache_path
+        self._cache_key = f"{project_id}/{database_id}"
         
     def load_countries_data(self, json_file_path: str) -> List[Dict]:
         """Load countries data from JSON file."""
         try:
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                countries_data = json.load(f)
+            if orjson is not None:
+                with open(json_file_path, 'rb') as f:
+                    countries_data = orjson.loads(f.read())
+            else:
+                with open(json_file_path, 'r', encoding='utf-8') as f:
+                    countries_data = json.load(f)
             
-            logger.info(f"Loaded {len(countries_data)} countries from {json_file_path}")
+            logger.info("Loaded %d countries from %s", len(countries_data), json_file_path)
             return countries_data
         except Exception as e:
-            logger.error(f"Failed to load countries data: {e}")
+            logger.error("Failed to load countries data: %s", e)
             raise
     
+    def _load_cache(self) -> Dict[str, str]:
+        """Load the payload hashes recorded for this project and database."""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get(self._cache_key, {})
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️  Ignoring unreadable update cache %s: %s", self.cache_path, e)
+            return {}
+    
+    def _save_cache(self, hashes: Dict[str, str]):
+        """Store the payload hashes for this project and database, replacing the file atomically."""
+        if not self.cache_path:
+            return
+        cache = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                pass
+        cache[self._cache_key] = hashes
+        
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, sort_keys=True)
+        os.replace(tmp_path, self.cache_path)
+    
+    @staticmethod
+    def _payload_hash(country_data: Dict) -> str:
+        """Hash a transformed country, ignoring the server-stamped updated_at."""
+        content = {key: value for key, value in country_data.items() if key != "updated_at"}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+    
     def transform_country_data(self, country_data: Dict) -> Dict:
         """Transform country data to match Firestore schema."""
         # Create a standardized country document structure
         transformed = {
-            "name": country_data["country"],
-            "local_name": country_data.get("local_name", ""),
-            "country_code": country_data["country_code"],
-            "continent": country_data["continent"],
-            "capital": country_data.get("capital", ""),
-            "population": country_data.get("population", 0),
-            "area_sq_km": country_data.get("area_sq_km", 0),
-            "area_sq_mi": country_data.get("area_sq_mi", 0),
-            "coastline_km": country_data.get("coastline_km", 0),
-            "coastline_mi": country_data.get("coastline_mi", 0),
-            "government_form": country_data.get("government_form", ""),
-            "currency": country_data.get("currency", ""),
-            "currency_code": country_data.get("currency_code", ""),
-            "dialing_prefix": country_data.get("dialing_prefix", ""),
-            "birthrate": country_data.get("birthrate", 0),
-            "deathrate": country_data.get("deathrate", 0),
-            "url": country_data.get("url", ""),
-            "is_active": True,
-            "updated_at": datetime.utcnow()
+            dst: country_data[src] if default is _REQUIRED else country_data.get(src, default)
+            for dst, src, default in _SCHEMA
         }
+        transformed["is_active"] = True
+        # Stamped by Firestore at commit time, avoiding client clock skew
+        transformed["updated_at"] = firestore.SERVER_TIMESTAMP
         
         # Generate a consistent ID from country code
         country_id = country_data["country_code"].lower()
@@ -86,103 +182,163 @@ class CountriesUpdater:
         
         return transformed
     
-    def get_existing_country(self, country_code: str) -> Optional[Dict]:
-        """Get existing country document by ISO alpha2 code from both countries and map_units collections."""
-        try:
-            # First check the countries collection
-            docs = self.collection.where("iso_alpha2", "==", country_code).limit(1).get()
-            if docs:
-                return docs[0].to_dict()
-            
-            # If not found, check the map_units collection
-            map_units_collection = self.db.collection("map_units")
-            docs = map_units_collection.where("iso_alpha2", "==", country_code).limit(1).get()
-            if docs:
-                logger.info(f"   📍 Found in map_units collection: {country_code}")
-                return docs[0].to_dict()
-            
-            return None
-        except Exception as e:
-            logger.warning(f"Error querying for country {country_code}: {e}")
-            return None
+    def _build_index(self, compare_only: bool = False):
+        """Index countries and map_units by ISO alpha2 code with one scan of each collection.
+        
+        Only the fields the updater reads are fetched, never the geometry: with
+        compare_only, iso_alpha2 and the fields written from the JSON data (all
+        a dry run needs to tell found, missing and unchanged countries apart);
+        otherwise the preserved fields as well.
+        """
+        self._index = {}
+        
+        # Countries take precedence over map_units with the same code
+        for collection_ref in (self.collection, self.map_units_collection):
+            fields = _COMPARED_FIELDS + ["iso_alpha2"]
+            if not compare_only:
+                fields += list(_PRESERVED_FIELDS)
+            query = collection_ref.select(fields)
+            for doc in query.stream(retry=FIRESTORE_RETRY):
+                iso_alpha2 = doc.to_dict().get("iso_alpha2")
+                if iso_alpha2 and iso_alpha2 not in self._index:
+                    self._index[iso_alpha2] = (doc, collection_ref)
+        
+        logger.info("Indexed %d existing countries and map units", len(self._index))
+    
+    def get_existing_country(self, country_code: str) -> Optional[Tuple[DocumentSnapshot, CollectionReference]]:
+        """Get existing country document and its collection by ISO alpha2 code from both countries and map_units collections."""
+        hit = self._index.get(country_code)
+        if hit is not None and hit[1] is self.map_units_collection:
+            logger.info("   📍 Found in map_units collection: %s", country_code)
+        return hit
     
-    def update_country(self, country_data: Dict, dry_run: bool = False) -> tuple[bool, bool]:
-        """Update existing country document. Returns (success, was_found)."""
+    def update_country(self, country_data: Dict, dry_run: bool = False) -> Tuple[bool, bool, Optional[Tuple]]:
+        """Prepare an update for an existing country document.
+        
+        Returns (success, was_found, write), where write is the (doc_ref, changes)
+        pair to be written, holding only the fields that differ from the stored
+        document plus updated_at, or None when there is nothing to write.
+        """
         country_id = country_data["id"]
         country_code = country_data["country_code"]
         
         try:
-            # Check if country already exists
-            existing_doc = self.get_existing_country(country_code)
+            # Check if country already exists; the snapshot carries its own
+            # reference, so no second lookup is needed to find the document ID
+            hit = self.get_existing_country(country_code)
             
-            if existing_doc:
-                logger.info(f"📍 Updating existing country: {country_data['name']} ({country_code})")
+            if hit:
+                snapshot, _ = hit
+                existing_doc = snapshot.to_dict()
+                doc_ref = snapshot.reference
+                logger.info("📍 Updating existing country: %s (%s)", country_data['name'], country_code)
                 
-                # Get the actual document ID from the existing document
-                # We need to get the document reference to update it properly
-                existing_doc_id = None
+                # Preserve existing fields that might not be in our JSON data
+                country_data.update({key: existing_doc[key] for key in _PRESERVED_FIELDS if key in existing_doc})
                 
-                # First check the countries collection
-                docs = self.collection.where("iso_alpha2", "==", country_code).limit(1).get()
-                if docs:
-                    existing_doc_id = docs[0].id
-                    collection_to_update = self.collection
-                else:
-                    # Check map_units collection
-                    map_units_collection = self.db.collection("map_units")
-                    docs = map_units_collection.where("iso_alpha2", "==", country_code).limit(1).get()
-                    if docs:
-                        existing_doc_id = docs[0].id
-                        collection_to_update = map_units_collection
+                # Set created_at if not present
+                if "created_at" not in country_data:
+                    country_data["created_at"] = firestore.SERVER_TIMESTAMP
                 
-                if existing_doc_id:
-                    # Preserve existing fields that might not be in our JSON data
-                    for key in ["created_at", "flag_url", "flag_emoji", "bounds", "iso_alpha3", "iso_numeric", "languages"]:
-                        if key in existing_doc:
-                            country_data[key] = existing_doc[key]
-                    
-                    # Set created_at if not present
-                    if "created_at" not in country_data:
-                        country_data["created_at"] = existing_doc.get("created_at", datetime.utcnow())
-                    
-                    if not dry_run:
-                        # Update the existing document using its actual ID
-                        doc_ref = collection_to_update.document(existing_doc_id)
-                        doc_ref.set(country_data, merge=True)
-                        logger.info(f"   ✅ Successfully updated {existing_doc_id}")
-                    else:
-                        logger.info(f"   🔍 Would update {existing_doc_id}")
-                    
-                    return True, True  # Success, was found
-                else:
-                    logger.error(f"   ❌ Could not determine document ID for {country_code}")
-                    return False, False
+                # Skip the write (and its listener fan-out) when nothing changed
+                if all(existing_doc.get(key) == country_data[key] for key in _COMPARED_FIELDS):
+                    logger.info("   ⏭️  Unchanged: %s", doc_ref.id)
+                    return True, True, None  # Success, was found
+                
+                if not dry_run:
+                    # Send only the changed fields, not the whole document
+                    changes = {
+                        key: value for key, value in country_data.items()
+                        if key == "updated_at" or key not in existing_doc or existing_doc[key] != value
+                    }
+                    logger.info("   ✅ Queued update of %d fields for %s", len(changes), doc_ref.id)
+                    return True, True, (doc_ref, changes)  # Success, was found
+                
+                logger.info("   🔍 Would update %s (in %s)", doc_ref.id, doc_ref.parent.id)
+                return True, True, None  # Success, was found
             else:
-                logger.warning(f"⚠️  Country not found in database: {country_data['name']} ({country_code})")
-                return False, False  # Not successful, was not found
+                logger.warning("⚠️  Country not found in database: %s (%s)", country_data['name'], country_code)
+                return False, False, None  # Not successful, was not found
             
         except Exception as e:
-            logger.error(f"   ❌ Error processing {country_id}: {e}")
-            return False, False  # Not successful, was not found
+            logger.error("   ❌ Error processing %s: %s", country_id, e)
+            return False, False, None  # Not successful, was not found
     
-    def update_all_countries(self, countries_data: List[Dict], dry_run: bool = False) -> Dict:
-        """Update all countries in the database."""
+    def update_all_countries(self, countries_data: List[Dict], dry_run: bool = False,
+                             force: bool = False) -> Dict:
+        """Update all countries in the database.
+        
+        Countries whose payload matches the hash cached from an earlier
+        successful write are skipped without any Firestore access, unless
+        force is set; the existing documents are only indexed on the first
+        cache miss, so a fully cached run makes no reads.
+        """
         logger.info("🌍 Starting countries update process...")
-        logger.info(f"📋 Project ID: {self.project_id}")
-        logger.info(f"🔍 Dry run: {dry_run}")
+        logger.info("📋 Project ID: %s", self.project_id)
+        logger.info("🔍 Dry run: %s", dry_run)
         logger.info("")
         
         success_count = 0
         error_count = 0
         not_found_count = 0
         not_found_countries = []
+        failed_writes = []
+        written = []
+        
+        cached_hashes = self._load_cache()
+        pending_hashes = {}  # doc ID -> (country_code, payload hash), recorded once written
+        index_built = False
+        
+        if not dry_run:
+            # BulkWriter sends the writes in parallel batches with its own
+            # throttling, instead of one blocking set() per country; retried
+            # writes back off exponentially instead of linearly
+            bulk_writer = self.db.bulk_writer(options=BulkWriterOptions(retry=BulkRetry.exponential))
+            
+            def on_write_error(error, _bulk_writer) -> bool:
+                if error.code in TRANSIENT_WRITE_ERRORS and error.attempts < MAX_WRITE_ATTEMPTS:
+                    return True
+                logger.error("   ❌ Failed to update %s: %s", error.operation.reference.id, error.message)
+                failed_writes.append(error)
+                return False
+            
+            bulk_writer.on_write_error(on_write_error)
+            # Callbacks run on the writer's worker threads; list.append is atomic
+            bulk_writer.on_write_result(lambda reference, _result, _bulk_writer: written.append(reference.id))
         
         for i, country_data in enumerate(countries_data, 1):
-            logger.info(f"Processing {i}/{len(countries_data)}: {country_data['country']}")
+            logger.info("Processing %d/%d: %s", i, len(countries_data), country_data['country'])
             
             try:
                 transformed_data = self.transform_country_data(country_data)
-                success, was_found = self.update_country(transformed_data, dry_run)
+                country_code = transformed_data["country_code"]
+                payload_hash = self._payload_hash(transformed_data)
+            except Exception as e:
+                logger.error("Failed to process %s: %s", country_data.get('country', 'Unknown'), e)
+                error_count += 1
+                continue
+            
+            if not force and cached_hashes.get(country_code) == payload_hash:
+                logger.info("   ⏭️  Unchanged since last run: %s", country_code)
+                success_count += 1
+                continue
+            
+            if not index_built:
+                # Two collection scans on the first cache miss instead of per-country queries
+                self._build_index(compare_only=dry_run)
+                index_built = True
+            
+            try:
+                success, was_found, write = self.update_country(transformed_data, dry_run)
+                
+                if write is not None:
+                    doc_ref, payload = write
+                    # Only existing documents are written, so update() can't hit a missing one
+                    bulk_writer.update(doc_ref, payload)
+                    pending_hashes[doc_ref.id] = (country_code, payload_hash)
+                elif success and was_found and not dry_run:
+                    # Already matches the stored document
+                    cached_hashes[country_code] = payload_hash
                 
                 if success and was_found:
                     success_count += 1
@@ -195,13 +351,21 @@ class CountriesUpdater:
                 else:
                     error_count += 1
             except Exception as e:
-                logger.error(f"Failed to process {country_data.get('country', 'Unknown')}: {e}")
+                logger.error("Failed to process %s: %s", country_data.get('country', 'Unknown'), e)
                 error_count += 1
                 continue
+        
+        if not dry_run:
+            # Wait for every queued write to finish
+            bulk_writer.close()
+            self._written_count = len(written)
+            success_count -= len(failed_writes)
+            error_count += len(failed_writes)
             
-            # Small delay to avoid overwhelming Firestore
-            if not dry_run:
-                time.sleep(0.1)
+            for doc_id in written:
+                country_code, payload_hash = pending_hashes[doc_id]
+                cached_hashes[country_code] = payload_hash
+            self._save_cache(cached_hashes)
         
         return {
             "total": len(countries_data),
@@ -212,14 +376,22 @@ class CountriesUpdater:
         }
     
     def verify_update(self) -> int:
-        """Verify the update by counting active countries."""
+        """Verify the update by counting active countries.
+
+        After a BulkWriter run the number of writes it confirmed is logged
+        as well; the return value is always the active-country count.
+        """
+        if self._written_count is not None:
+            logger.info("✅ Confirmed %d country writes committed", self._written_count)
+
         try:
-            docs = self.collection.where("is_active", "==", True).limit(1000).get()
-            count = len(docs)
-            logger.info(f"✅ Found {count} active countries in database")
+            # Server-side count aggregation: one integer back, no document transfer or cap
+            query = self.collection.where(filter=FieldFilter("is_active", "==", True))
+            count = query.count().get(retry=FIRESTORE_RETRY)[0][0].value
+            logger.info("✅ Found %d active countries in database", count)
             return count
         except Exception as e:
-            logger.warning(f"⚠️  Verification failed: {e}")
+            logger.warning("⚠️  Verification failed: %s", e)
             return 0
 
 def main():
@@ -231,44 +403,48 @@ def main():
                        help="Show what would be updated without actually updating")
     parser.add_argument("--database-id", default="statlas-content", 
                        help="Firestore database ID")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                       help="Path of the local cache of already-written countries")
+    parser.add_argument("--force", action="store_true",
+                       help="Ignore the local cache and process every country")
     
     args = parser.parse_args()
     
     try:
-        updater = CountriesUpdater(args.project_id, args.database_id)
+        updater = CountriesUpdater(args.project_id, args.database_id, args.cache)
         
         # Load countries data
         countries_data = updater.load_countries_data(args.json_file)
         
         # Update all countries
-        results = updater.update_all_countries(countries_data, args.dry_run)
+        results = updater.update_all_countries(countries_data, args.dry_run, args.force)
         
         # Print summary
         logger.info("=" * 50)
         logger.info("📊 UPDATE SUMMARY")
         logger.info("=" * 50)
-        logger.info(f"Total countries processed: {results['total']}")
-        logger.info(f"Successful updates: {results['success']}")
-        logger.info(f"Errors: {results['errors']}")
-        logger.info(f"Countries not found: {results['not_found']}")
+        logger.info("Total countries processed: %d", results['total'])
+        logger.info("Successful updates: %d", results['success'])
+        logger.info("Errors: %d", results['errors'])
+        logger.info("Countries not found: %d", results['not_found'])
         
         if results['not_found'] > 0:
             logger.info("")
             logger.info("⚠️  COUNTRIES NOT FOUND IN DATABASE:")
             logger.info("=" * 30)
             for country in results['not_found_countries']:
-                logger.info(f"   {country['name']} ({country['code']})")
+                logger.info("   %s (%s)", country['name'], country['code'])
         
         if not args.dry_run:
-            logger.info()
+            logger.info("")
             logger.info("🔍 Verifying update...")
             active_count = updater.verify_update()
-            logger.info(f"Active countries in database: {active_count}")
+            logger.info("Active countries in database: %d", active_count)
         
         logger.info("=" * 50)
         
     except Exception as e:
-        logger.error(f"❌ Update failed: {e}")
+        logger.error("❌ Update failed: %s", e)
         sys.exit(1)
 
 if __name__ == "__main__":
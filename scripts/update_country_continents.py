@@ -8,10 +8,14 @@ It handles sovereign states, countries, and map units with comprehensive contine
 
 import argparse
 import sys
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Mapping, Optional, Tuple
 import logging
 
 try:
+    from google.api_core import retry
     from google.cloud import firestore
     from google.cloud.firestore_v1 import FieldFilter
 except ImportError:
@@ -22,6 +26,331 @@ except ImportError:
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# The only fields the continent lookup and its log messages read
+_LOOKUP_FIELDS = ["continent", "iso_alpha2", "iso_alpha3", "id", "name"]
+
+# Maximum number of operations Firestore accepts in one batched write
+BATCH_SIZE = 500
+
+# Batch commits in flight at once per collection
+MAX_COMMIT_WORKERS = 8
+
+# Backoff for batch commits on transient errors; re-applying the same continent is idempotent
+COMMIT_RETRY = retry.Retry(predicate=retry.if_transient_error, initial=1.0, maximum=30.0,
+                           multiplier=2.0, timeout=300.0)
+
+# Continent by ISO alpha-2 code, ISO alpha-3 code and normalized country name,
+# built once per process and shared read-only by every ContinentUpdater
+CONTINENT_MAPPING: Mapping[str, str] = MappingProxyType({
+    # Africa
+    "DZ": "Africa", "algeria": "Africa",
+    "AO": "Africa", "angola": "Africa", 
+    "BJ": "Africa", "benin": "Africa",
+    "BW": "Africa", "botswana": "Africa",
+    "BF": "Africa", "burkina_faso": "Africa",
+    "BI": "Africa", "burundi": "Africa",
+    "CM": "Africa", "cameroon": "Africa",
+    "CV": "Africa", "cape_verde": "Africa",
+    "CF": "Africa", "central_african_republic": "Africa",
+    "TD": "Africa", "chad": "Africa",
+    "KM": "Africa", "comoros": "Africa",
+    "CG": "Africa", "congo": "Africa",
+    "CD": "Africa", "democratic_republic_of_the_congo": "Africa",
+    "DJ": "Africa", "djibouti": "Africa",
+    "EG": "Africa", "egypt": "Africa",
+    "GQ": "Africa", "equatorial_guinea": "Africa",
+    "ER": "Africa", "eritrea": "Africa",
+    "ET": "Africa", "ethiopia": "Africa",
+    "GA": "Africa", "gabon": "Africa",
+    "GM": "Africa", "gambia": "Africa",
+    "GH": "Africa", "ghana": "Africa",
+    "GN": "Africa", "guinea": "Africa",
+    "GW": "Africa", "guinea_bissau": "Africa",
+    "CI": "Africa", "ivory_coast": "Africa", "cote_d_ivoire": "Africa",
+    "KE": "Africa", "kenya": "Africa",
+    "LS": "Africa", "lesotho": "Africa",
+    "LR": "Africa", "liberia": "Africa",
+    "LY": "Africa", "libya": "Africa",
+    "MG": "Africa", "madagascar": "Africa",
+    "MW": "Africa", "malawi": "Africa",
+    "ML": "Africa", "mali": "Africa",
+    "MR": "Africa", "mauritania": "Africa",
+    "MU": "Africa", "mauritius": "Africa",
+    "MA": "Africa", "morocco": "Africa",
+    "MZ": "Africa", "mozambique": "Africa",
+    "NA": "Africa", "namibia": "Africa",
+    "NE": "Africa", "niger": "Africa",
+    "NG": "Africa", "nigeria": "Africa",
+    "RW": "Africa", "rwanda": "Africa",
+    "ST": "Africa", "sao_tome_and_principe": "Africa",
+    "SN": "Africa", "senegal": "Africa",
+    "SC": "Africa", "seychelles": "Africa",
+    "SL": "Africa", "sierra_leone": "Africa",
+    "SO": "Africa", "somalia": "Africa",
+    "ZA": "Africa", "south_africa": "Africa",
+    "SS": "Africa", "south_sudan": "Africa",
+    "SD": "Africa", "sudan": "Africa",
+    "SZ": "Africa", "swaziland": "Africa", "eswatini": "Africa",
+    "TZ": "Africa", "tanzania": "Africa",
+    "TG": "Africa", "togo": "Africa",
+    "TN": "Africa", "tunisia": "Africa",
+    "UG": "Africa", "uganda": "Africa",
+    "ZM": "Africa", "zambia": "Africa",
+    "ZW": "Africa", "zimbabwe": "Africa",
+    
+    # Asia
+    "AF": "Asia", "afghanistan": "Asia",
+    "AM": "Asia", "armenia": "Asia",
+    "AZ": "Asia", "azerbaijan": "Asia",
+    "BH": "Asia", "bahrain": "Asia",
+    "BD": "Asia", "bangladesh": "Asia",
+    "BT": "Asia", "bhutan": "Asia",
+    "BN": "Asia", "brunei": "Asia",
+    "KH": "Asia", "cambodia": "Asia",
+    "CN": "Asia", "china": "Asia",
+    "CY": "Asia", "cyprus": "Asia",  # Geographically in Asia
+    "GE": "Asia", "georgia": "Asia",
+    "IN": "Asia", "india": "Asia",
+    "ID": "Asia", "indonesia": "Asia",
+    "IR": "Asia", "iran": "Asia",
+    "IQ": "Asia", "iraq": "Asia",
+    "IL": "Asia", "israel": "Asia",
+    "JP": "Asia", "japan": "Asia",
+    "JO": "Asia", "jordan": "Asia",
+    "KZ": "Asia", "kazakhstan": "Asia",
+    "KW": "Asia", "kuwait": "Asia",
+    "KG": "Asia", "kyrgyzstan": "Asia",
+    "LA": "Asia", "laos": "Asia",
+    "LB": "Asia", "lebanon": "Asia",
+    "MY": "Asia", "malaysia": "Asia",
+    "MV": "Asia", "maldives": "Asia",
+    "MN": "Asia", "mongolia": "Asia",
+    "MM": "Asia", "myanmar": "Asia", "burma": "Asia",
+    "NP": "Asia", "nepal": "Asia",
+    "KP": "Asia", "north_korea": "Asia",
+    "OM": "Asia", "oman": "Asia",
+    "PK": "Asia", "pakistan": "Asia",
+    "PS": "Asia", "palestine": "Asia",
+    "PH": "Asia", "philippines": "Asia",
+    "QA": "Asia", "qatar": "Asia",
+    "SA": "Asia", "saudi_arabia": "Asia",
+    "SG": "Asia", "singapore": "Asia",
+    "KR": "Asia", "south_korea": "Asia",
+    "LK": "Asia", "sri_lanka": "Asia",
+    "SY": "Asia", "syria": "Asia",
+    "TW": "Asia", "taiwan": "Asia",
+    "TJ": "Asia", "tajikistan": "Asia",
+    "TH": "Asia", "thailand": "Asia",
+    "TL": "Asia", "east_timor": "Asia", "timor_leste": "Asia",
+    "TR": "Asia", "turkey": "Asia",  # Mostly in Asia
+    "TM": "Asia", "turkmenistan": "Asia",
+    "AE": "Asia", "united_arab_emirates": "Asia",
+    "UZ": "Asia", "uzbekistan": "Asia",
+    "VN": "Asia", "vietnam": "Asia",
+    "YE": "Asia", "yemen": "Asia",
+    
+    # Europe
+    "AL": "Europe", "albania": "Europe",
+    "AD": "Europe", "andorra": "Europe",
+    "AT": "Europe", "austria": "Europe",
+    "BY": "Europe", "belarus": "Europe",
+    "BE": "Europe", "belgium": "Europe",
+    "BA": "Europe", "bosnia_and_herzegovina": "Europe",
+    "BG": "Europe", "bulgaria": "Europe",
+    "HR": "Europe", "croatia": "Europe",
+    "CZ": "Europe", "czech_republic": "Europe", "czechia": "Europe",
+    "DK": "Europe", "denmark": "Europe",
+    "EE": "Europe", "estonia": "Europe",
+    "FI": "Europe", "finland": "Europe",
+    "FR": "Europe", "france": "Europe",
+    "DE": "Europe", "germany": "Europe",
+    "GR": "Europe", "greece": "Europe",
+    "HU": "Europe", "hungary": "Europe",
+    "IS": "Europe", "iceland": "Europe",
+    "IE": "Europe", "ireland": "Europe",
+    "IT": "Europe", "italy": "Europe",
+    "XK": "Europe", "kosovo": "Europe",
+    "LV": "Europe", "latvia": "Europe",
+    "LI": "Europe", "liechtenstein": "Europe",
+    "LT": "Europe", "lithuania": "Europe",
+    "LU": "Europe", "luxembourg": "Europe",
+    "MT": "Europe", "malta": "Europe",
+    "MD": "Europe", "moldova": "Europe",
+    "MC": "Europe", "monaco": "Europe",
+    "ME": "Europe", "montenegro": "Europe",
+    "NL": "Europe", "netherlands": "Europe",
+    "MK": "Europe", "north_macedonia": "Europe", "macedonia": "Europe",
+    "NO": "Europe", "norway": "Europe",
+    "PL": "Europe", "poland": "Europe",
+    "PT": "Europe", "portugal": "Europe",
+    "RO": "Europe", "romania": "Europe",
+    "RU": "Europe", "russia": "Europe",  # Mostly in Asia, but politically/culturally European
+    "SM": "Europe", "san_marino": "Europe",
+    "RS": "Europe", "serbia": "Europe",
+    "SK": "Europe", "slovakia": "Europe",
+    "SI": "Europe", "slovenia": "Europe",
+    "ES": "Europe", "spain": "Europe",
+    "SE": "Europe", "sweden": "Europe",
+    "CH": "Europe", "switzerland": "Europe",
+    "UA": "Europe", "ukraine": "Europe",
+    "GB": "Europe", "united_kingdom": "Europe",
+    "VA": "Europe", "vatican": "Europe", "vatican_city": "Europe",
+    
+    # North America
+    "AG": "North America", "antigua_and_barbuda": "North America",
+    "BS": "North America", "bahamas": "North America",
+    "BB": "North America", "barbados": "North America",
+    "BZ": "North America", "belize": "North America",
+    "CA": "North America", "canada": "North America",
+    "CR": "North America", "costa_rica": "North America",
+    "CU": "North America", "cuba": "North America",
+    "DM": "North America", "dominica": "North America",
+    "DO": "North America", "dominican_republic": "North America",
+    "SV": "North America", "el_salvador": "North America",
+    "GD": "North America", "grenada": "North America",
+    "GT": "North America", "guatemala": "North America",
+    "HT": "North America", "haiti": "North America",
+    "HN": "North America", "honduras": "North America",
+    "JM": "North America", "jamaica": "North America",
+    "MX": "North America", "mexico": "North America",
+    "NI": "North America", "nicaragua": "North America",
+    "PA": "North America", "panama": "North America",
+    "KN": "North America", "saint_kitts_and_nevis": "North America",
+    "LC": "North America", "saint_lucia": "North America",
+    "VC": "North America", "saint_vincent_and_the_grenadines": "North America",
+    "TT": "North America", "trinidad_and_tobago": "North America",
+    "US": "North America", "united_states": "North America",
+    
+    # North American Territories
+    "AI": "North America", "anguilla": "North America",
+    "AW": "North America", "aruba": "North America",
+    "BM": "North America", "bermuda": "North America",
+    "VG": "North America", "british_virgin_islands": "North America",
+    "KY": "North America", "cayman_islands": "North America",
+    "CW": "North America", "curacao": "North America",
+    "GL": "North America", "greenland": "North America",
+    "GP": "North America", "guadeloupe": "North America",
+    "MQ": "North America", "martinique": "North America",
+    "MS": "North America", "montserrat": "North America",
+    "PR": "North America", "puerto_rico": "North America",
+    "BL": "North America", "saint_barthelemy": "North America",
+    "MF": "North America", "saint_martin": "North America",
+    "PM": "North America", "saint_pierre_and_miquelon": "North America",
+    "SX": "North America", "sint_maarten": "North America",
+    "TC": "North America", "turks_and_caicos_islands": "North America",
+    "VI": "North America", "us_virgin_islands": "North America",
+    
+    # South America
+    "AR": "South America", "argentina": "South America",
+    "BO": "South America", "bolivia": "South America",
+    "BR": "South America", "brazil": "South America",
+    "CL": "South America", "chile": "South America",
+    "CO": "South America", "colombia": "South America",
+    "EC": "South America", "ecuador": "South America",
+    "FK": "South America", "falkland_islands": "South America",
+    "GF": "South America", "french_guiana": "South America",
+    "GY": "South America", "guyana": "South America",
+    "PY": "South America", "paraguay": "South America",
+    "PE": "South America", "peru": "South America",
+    "SR": "South America", "suriname": "South America",
+    "UY": "South America", "uruguay": "South America",
+    "VE": "South America", "venezuela": "South America",
+    
+    # Oceania
+    "AU": "Oceania", "australia": "Oceania",
+    "FJ": "Oceania", "fiji": "Oceania",
+    "KI": "Oceania", "kiribati": "Oceania",
+    "MH": "Oceania", "marshall_islands": "Oceania",
+    "FM": "Oceania", "micronesia": "Oceania",
+    "NR": "Oceania", "nauru": "Oceania",
+    "NZ": "Oceania", "new_zealand": "Oceania",
+    "PW": "Oceania", "palau": "Oceania",
+    "PG": "Oceania", "papua_new_guinea": "Oceania",
+    "WS": "Oceania", "samoa": "Oceania",
+    "SB": "Oceania", "solomon_islands": "Oceania",
+    "TO": "Oceania", "tonga": "Oceania",
+    "TV": "Oceania", "tuvalu": "Oceania",
+    "VU": "Oceania", "vanuatu": "Oceania",
+    
+    # Oceania Territories
+    "AS": "Oceania", "american_samoa": "Oceania",
+    "CK": "Oceania", "cook_islands": "Oceania",
+    "PF": "Oceania", "french_polynesia": "Oceania",
+    "GU": "Oceania", "guam": "Oceania",
+    "NC": "Oceania", "new_caledonia": "Oceania",
+    "NU": "Oceania", "niue": "Oceania",
+    "NF": "Oceania", "norfolk_island": "Oceania",
+    "MP": "Oceania", "northern_mariana_islands": "Oceania",
+    "PN": "Oceania", "pitcairn": "Oceania",
+    "TK": "Oceania", "tokelau": "Oceania",
+    "WF": "Oceania", "wallis_and_futuna": "Oceania",
+    
+    # Antarctica
+    "AQ": "Antarctica", "antarctica": "Antarctica",
+    
+    # Special cases and territories
+    "akrotiri": "Asia",  # British base in Cyprus
+    "dhekelia": "Asia",  # British base in Cyprus
+    "hong_kong": "Asia",
+    "macau": "Asia", "macao": "Asia",
+    "western_sahara": "Africa", "w_sahara": "Africa",
+    "somaliland": "Africa",
+    
+    # Additional mappings for missing countries
+    "united_states_of_america": "North America",
+    "faeroe_is": "Europe", "faroe_islands": "Europe",
+    "gibraltar": "Europe",
+    "guernsey": "Europe", 
+    "jersey": "Europe",
+    "isle_of_man": "Europe",
+    "åland": "Europe", "aland": "Europe",
+    
+    # Antarctic territories  
+    "fr_s_antarctic_lands": "Antarctica",
+    "heard_i_and_mcdonald_is": "Antarctica",
+    "s_geo_and_the_is": "Antarctica", "south_georgia_and_the_south_sandwich_islands": "Antarctica",
+    
+    # Atlantic islands
+    "saint_helena": "Africa", "st_helena": "Africa",
+    
+    # Pacific territories
+    "u_s_minor_outlying_is": "Oceania",
+    "ashmore_and_cartier_is": "Oceania",
+    "coral_sea_is": "Oceania",
+    
+    # Indian Ocean
+    "br_indian_ocean_ter": "Asia", "british_indian_ocean_territory": "Asia",
+    
+    # Disputed/Special zones
+    "n_cyprus": "Asia", "northern_cyprus": "Asia",
+    "cyprus_u_n_buffer_zone": "Asia",
+    "baikonur": "Asia",  # Kazakhstan
+    "siachen_glacier": "Asia",  # India/Pakistan dispute
+    
+    # Uninhabited/Research areas
+    "bir_tawil": "Africa",  # Egypt/Sudan
+    "southern_patagonian_ice_field": "South America",
+    
+    # Pacific reefs/banks
+    "scarborough_reef": "Asia",  # South China Sea
+    "spratly_is": "Asia",  # South China Sea
+    "bajo_nuevo_bank": "North America",  # Caribbean
+    "serranilla_bank": "North America",  # Caribbean
+    "brazilian_i": "South America",  # Brazil
+    "clipperton_i": "North America",  # Pacific, belongs to France but geographically North America
+    
+    # US territories
+    "usnb_guantanamo_bay": "North America",  # Cuba
+})
+
+# Lowercased country names as they appear in documents ("burkina faso",
+# "guinea-bissau"), so most names resolve without normalizing them first
+_NAME_TO_CONTINENT: Mapping[str, str] = MappingProxyType({
+    variant: continent
+    for key, continent in CONTINENT_MAPPING.items()
+    for variant in (key, key.replace("_", " "), key.replace("_", "-"))
+})
+
 class ContinentUpdater:
     """Updates continent information for countries in Firestore."""
     
@@ -37,311 +366,7 @@ class ContinentUpdater:
         self.db = firestore.Client(project=project_id, database=database_id)
         
         # Comprehensive continent mapping based on ISO codes and country names
-        self.continent_mapping = self._create_continent_mapping()
-    
-    def _create_continent_mapping(self) -> Dict[str, str]:
-        """Create comprehensive continent mapping for countries."""
-        return {
-            # Africa
-            "DZ": "Africa", "algeria": "Africa",
-            "AO": "Africa", "angola": "Africa", 
-            "BJ": "Africa", "benin": "Africa",
-            "BW": "Africa", "botswana": "Africa",
-            "BF": "Africa", "burkina_faso": "Africa",
-            "BI": "Africa", "burundi": "Africa",
-            "CM": "Africa", "cameroon": "Africa",
-            "CV": "Africa", "cape_verde": "Africa",
-            "CF": "Africa", "central_african_republic": "Africa",
-            "TD": "Africa", "chad": "Africa",
-            "KM": "Africa", "comoros": "Africa",
-            "CG": "Africa", "congo": "Africa",
-            "CD": "Africa", "democratic_republic_of_the_congo": "Africa",
-            "DJ": "Africa", "djibouti": "Africa",
-            "EG": "Africa", "egypt": "Africa",
-            "GQ": "Africa", "equatorial_guinea": "Africa",
-            "ER": "Africa", "eritrea": "Africa",
-            "ET": "Africa", "ethiopia": "Africa",
-            "GA": "Africa", "gabon": "Africa",
-            "GM": "Africa", "gambia": "Africa",
-            "GH": "Africa", "ghana": "Africa",
-            "GN": "Africa", "guinea": "Africa",
-            "GW": "Africa", "guinea_bissau": "Africa",
-            "CI": "Africa", "ivory_coast": "Africa", "cote_d_ivoire": "Africa",
-            "KE": "Africa", "kenya": "Africa",
-            "LS": "Africa", "lesotho": "Africa",
-            "LR": "Africa", "liberia": "Africa",
-            "LY": "Africa", "libya": "Africa",
-            "MG": "Africa", "madagascar": "Africa",
-            "MW": "Africa", "malawi": "Africa",
-            "ML": "Africa", "mali": "Africa",
-            "MR": "Africa", "mauritania": "Africa",
-            "MU": "Africa", "mauritius": "Africa",
-            "MA": "Africa", "morocco": "Africa",
-            "MZ": "Africa", "mozambique": "Africa",
-            "NA": "Africa", "namibia": "Africa",
-            "NE": "Africa", "niger": "Africa",
-            "NG": "Africa", "nigeria": "Africa",
-            "RW": "Africa", "rwanda": "Africa",
-            "ST": "Africa", "sao_tome_and_principe": "Africa",
-            "SN": "Africa", "senegal": "Africa",
-            "SC": "Africa", "seychelles": "Africa",
-            "SL": "Africa", "sierra_leone": "Africa",
-            "SO": "Africa", "somalia": "Africa",
-            "ZA": "Africa", "south_africa": "Africa",
-            "SS": "Africa", "south_sudan": "Africa",
-            "SD": "Africa", "sudan": "Africa",
-            "SZ": "Africa", "swaziland": "Africa", "eswatini": "Africa",
-            "TZ": "Africa", "tanzania": "Africa",
-            "TG": "Africa", "togo": "Africa",
-            "TN": "Africa", "tunisia": "Africa",
-            "UG": "Africa", "uganda": "Africa",
-            "ZM": "Africa", "zambia": "Africa",
-            "ZW": "Africa", "zimbabwe": "Africa",
-            
-            # Asia
-            "AF": "Asia", "afghanistan": "Asia",
-            "AM": "Asia", "armenia": "Asia",
-            "AZ": "Asia", "azerbaijan": "Asia",
-            "BH": "Asia", "bahrain": "Asia",
-            "BD": "Asia", "bangladesh": "Asia",
-            "BT": "Asia", "bhutan": "Asia",
-            "BN": "Asia", "brunei": "Asia",
-            "KH": "Asia", "cambodia": "Asia",
-            "CN": "Asia", "china": "Asia",
-            "CY": "Asia", "cyprus": "Asia",  # Geographically in Asia
-            "GE": "Asia", "georgia": "Asia",
-            "IN": "Asia", "india": "Asia",
-            "ID": "Asia", "indonesia": "Asia",
-            "IR": "Asia", "iran": "Asia",
-            "IQ": "Asia", "iraq": "Asia",
-            "IL": "Asia", "israel": "Asia",
-            "JP": "Asia", "japan": "Asia",
-            "JO": "Asia", "jordan": "Asia",
-            "KZ": "Asia", "kazakhstan": "Asia",
-            "KW": "Asia", "kuwait": "Asia",
-            "KG": "Asia", "kyrgyzstan": "Asia",
-            "LA": "Asia", "laos": "Asia",
-            "LB": "Asia", "lebanon": "Asia",
-            "MY": "Asia", "malaysia": "Asia",
-            "MV": "Asia", "maldives": "Asia",
-            "MN": "Asia", "mongolia": "Asia",
-            "MM": "Asia", "myanmar": "Asia", "burma": "Asia",
-            "NP": "Asia", "nepal": "Asia",
-            "KP": "Asia", "north_korea": "Asia",
-            "OM": "Asia", "oman": "Asia",
-            "PK": "Asia", "pakistan": "Asia",
-            "PS": "Asia", "palestine": "Asia",
-            "PH": "Asia", "philippines": "Asia",
-            "QA": "Asia", "qatar": "Asia",
-            "SA": "Asia", "saudi_arabia": "Asia",
-            "SG": "Asia", "singapore": "Asia",
-            "KR": "Asia", "south_korea": "Asia",
-            "LK": "Asia", "sri_lanka": "Asia",
-            "SY": "Asia", "syria": "Asia",
-            "TW": "Asia", "taiwan": "Asia",
-            "TJ": "Asia", "tajikistan": "Asia",
-            "TH": "Asia", "thailand": "Asia",
-            "TL": "Asia", "east_timor": "Asia", "timor_leste": "Asia",
-            "TR": "Asia", "turkey": "Asia",  # Mostly in Asia
-            "TM": "Asia", "turkmenistan": "Asia",
-            "AE": "Asia", "united_arab_emirates": "Asia",
-            "UZ": "Asia", "uzbekistan": "Asia",
-            "VN": "Asia", "vietnam": "Asia",
-            "YE": "Asia", "yemen": "Asia",
-            
-            # Europe
-            "AL": "Europe", "albania": "Europe",
-            "AD": "Europe", "andorra": "Europe",
-            "AT": "Europe", "austria": "Europe",
-            "BY": "Europe", "belarus": "Europe",
-            "BE": "Europe", "belgium": "Europe",
-            "BA": "Europe", "bosnia_and_herzegovina": "Europe",
-            "BG": "Europe", "bulgaria": "Europe",
-            "HR": "Europe", "croatia": "Europe",
-            "CZ": "Europe", "czech_republic": "Europe", "czechia": "Europe",
-            "DK": "Europe", "denmark": "Europe",
-            "EE": "Europe", "estonia": "Europe",
-            "FI": "Europe", "finland": "Europe",
-            "FR": "Europe", "france": "Europe",
-            "DE": "Europe", "germany": "Europe",
-            "GR": "Europe", "greece": "Europe",
-            "HU": "Europe", "hungary": "Europe",
-            "IS": "Europe", "iceland": "Europe",
-            "IE": "Europe", "ireland": "Europe",
-            "IT": "Europe", "italy": "Europe",
-            "XK": "Europe", "kosovo": "Europe",
-            "LV": "Europe", "latvia": "Europe",
-            "LI": "Europe", "liechtenstein": "Europe",
-            "LT": "Europe", "lithuania": "Europe",
-            "LU": "Europe", "luxembourg": "Europe",
-            "MT": "Europe", "malta": "Europe",
-            "MD": "Europe", "moldova": "Europe",
-            "MC": "Europe", "monaco": "Europe",
-            "ME": "Europe", "montenegro": "Europe",
-            "NL": "Europe", "netherlands": "Europe",
-            "MK": "Europe", "north_macedonia": "Europe", "macedonia": "Europe",
-            "NO": "Europe", "norway": "Europe",
-            "PL": "Europe", "poland": "Europe",
-            "PT": "Europe", "portugal": "Europe",
-            "RO": "Europe", "romania": "Europe",
-            "RU": "Europe", "russia": "Europe",  # Mostly in Asia, but politically/culturally European
-            "SM": "Europe", "san_marino": "Europe",
-            "RS": "Europe", "serbia": "Europe",
-            "SK": "Europe", "slovakia": "Europe",
-            "SI": "Europe", "slovenia": "Europe",
-            "ES": "Europe", "spain": "Europe",
-            "SE": "Europe", "sweden": "Europe",
-            "CH": "Europe", "switzerland": "Europe",
-            "UA": "Europe", "ukraine": "Europe",
-            "GB": "Europe", "united_kingdom": "Europe",
-            "VA": "Europe", "vatican": "Europe", "vatican_city": "Europe",
-            
-            # North America
-            "AG": "North America", "antigua_and_barbuda": "North America",
-            "BS": "North America", "bahamas": "North America",
-            "BB": "North America", "barbados": "North America",
-            "BZ": "North America", "belize": "North America",
-            "CA": "North America", "canada": "North America",
-            "CR": "North America", "costa_rica": "North America",
-            "CU": "North America", "cuba": "North America",
-            "DM": "North America", "dominica": "North America",
-            "DO": "North America", "dominican_republic": "North America",
-            "SV": "North America", "el_salvador": "North America",
-            "GD": "North America", "grenada": "North America",
-            "GT": "North America", "guatemala": "North America",
-            "HT": "North America", "haiti": "North America",
-            "HN": "North America", "honduras": "North America",
-            "JM": "North America", "jamaica": "North America",
-            "MX": "North America", "mexico": "North America",
-            "NI": "North America", "nicaragua": "North America",
-            "PA": "North America", "panama": "North America",
-            "KN": "North America", "saint_kitts_and_nevis": "North America",
-            "LC": "North America", "saint_lucia": "North America",
-            "VC": "North America", "saint_vincent_and_the_grenadines": "North America",
-            "TT": "North America", "trinidad_and_tobago": "North America",
-            "US": "North America", "united_states": "North America",
-            
-            # North American Territories
-            "AI": "North America", "anguilla": "North America",
-            "AW": "North America", "aruba": "North America",
-            "BM": "North America", "bermuda": "North America",
-            "VG": "North America", "british_virgin_islands": "North America",
-            "KY": "North America", "cayman_islands": "North America",
-            "CW": "North America", "curacao": "North America",
-            "GL": "North America", "greenland": "North America",
-            "GP": "North America", "guadeloupe": "North America",
-            "MQ": "North America", "martinique": "North America",
-            "MS": "North America", "montserrat": "North America",
-            "PR": "North America", "puerto_rico": "North America",
-            "BL": "North America", "saint_barthelemy": "North America",
-            "MF": "North America", "saint_martin": "North America",
-            "PM": "North America", "saint_pierre_and_miquelon": "North America",
-            "SX": "North America", "sint_maarten": "North America",
-            "TC": "North America", "turks_and_caicos_islands": "North America",
-            "VI": "North America", "us_virgin_islands": "North America",
-            
-            # South America
-            "AR": "South America", "argentina": "South America",
-            "BO": "South America", "bolivia": "South America",
-            "BR": "South America", "brazil": "South America",
-            "CL": "South America", "chile": "South America",
-            "CO": "South America", "colombia": "South America",
-            "EC": "South America", "ecuador": "South America",
-            "FK": "South America", "falkland_islands": "South America",
-            "GF": "South America", "french_guiana": "South America",
-            "GY": "South America", "guyana": "South America",
-            "PY": "South America", "paraguay": "South America",
-            "PE": "South America", "peru": "South America",
-            "SR": "South America", "suriname": "South America",
-            "UY": "South America", "uruguay": "South America",
-            "VE": "South America", "venezuela": "South America",
-            
-            # Oceania
-            "AU": "Oceania", "australia": "Oceania",
-            "FJ": "Oceania", "fiji": "Oceania",
-            "KI": "Oceania", "kiribati": "Oceania",
-            "MH": "Oceania", "marshall_islands": "Oceania",
-            "FM": "Oceania", "micronesia": "Oceania",
-            "NR": "Oceania", "nauru": "Oceania",
-            "NZ": "Oceania", "new_zealand": "Oceania",
-            "PW": "Oceania", "palau": "Oceania",
-            "PG": "Oceania", "papua_new_guinea": "Oceania",
-            "WS": "Oceania", "samoa": "Oceania",
-            "SB": "Oceania", "solomon_islands": "Oceania",
-            "TO": "Oceania", "tonga": "Oceania",
-            "TV": "Oceania", "tuvalu": "Oceania",
-            "VU": "Oceania", "vanuatu": "Oceania",
-            
-            # Oceania Territories
-            "AS": "Oceania", "american_samoa": "Oceania",
-            "CK": "Oceania", "cook_islands": "Oceania",
-            "PF": "Oceania", "french_polynesia": "Oceania",
-            "GU": "Oceania", "guam": "Oceania",
-            "NC": "Oceania", "new_caledonia": "Oceania",
-            "NU": "Oceania", "niue": "Oceania",
-            "NF": "Oceania", "norfolk_island": "Oceania",
-            "MP": "Oceania", "northern_mariana_islands": "Oceania",
-            "PN": "Oceania", "pitcairn": "Oceania",
-            "TK": "Oceania", "tokelau": "Oceania",
-            "WF": "Oceania", "wallis_and_futuna": "Oceania",
-            
-            # Antarctica
-            "AQ": "Antarctica", "antarctica": "Antarctica",
-            
-            # Special cases and territories
-            "akrotiri": "Asia",  # British base in Cyprus
-            "dhekelia": "Asia",  # British base in Cyprus
-            "hong_kong": "Asia",
-            "macau": "Asia", "macao": "Asia",
-            "western_sahara": "Africa", "w_sahara": "Africa",
-            "somaliland": "Africa",
-            
-            # Additional mappings for missing countries
-            "united_states_of_america": "North America",
-            "faeroe_is": "Europe", "faroe_islands": "Europe",
-            "gibraltar": "Europe",
-            "guernsey": "Europe", 
-            "jersey": "Europe",
-            "isle_of_man": "Europe",
-            "åland": "Europe", "aland": "Europe",
-            
-            # Antarctic territories  
-            "fr_s_antarctic_lands": "Antarctica",
-            "heard_i_and_mcdonald_is": "Antarctica",
-            "s_geo_and_the_is": "Antarctica", "south_georgia_and_the_south_sandwich_islands": "Antarctica",
-            
-            # Atlantic islands
-            "saint_helena": "Africa", "st_helena": "Africa",
-            
-            # Pacific territories
-            "u_s_minor_outlying_is": "Oceania",
-            "ashmore_and_cartier_is": "Oceania",
-            "coral_sea_is": "Oceania",
-            
-            # Indian Ocean
-            "br_indian_ocean_ter": "Asia", "british_indian_ocean_territory": "Asia",
-            
-            # Disputed/Special zones
-            "n_cyprus": "Asia", "northern_cyprus": "Asia",
-            "cyprus_u_n_buffer_zone": "Asia",
-            "baikonur": "Asia",  # Kazakhstan
-            "siachen_glacier": "Asia",  # India/Pakistan dispute
-            
-            # Uninhabited/Research areas
-            "bir_tawil": "Africa",  # Egypt/Sudan
-            "southern_patagonian_ice_field": "South America",
-            
-            # Pacific reefs/banks
-            "scarborough_reef": "Asia",  # South China Sea
-            "spratly_is": "Asia",  # South China Sea
-            "bajo_nuevo_bank": "North America",  # Caribbean
-            "serranilla_bank": "North America",  # Caribbean
-            "brazilian_i": "South America",  # Brazil
-            "clipperton_i": "North America",  # Pacific, belongs to France but geographically North America
-            
-            # US territories
-            "usnb_guantanamo_bay": "North America",  # Cuba
-        }
+        self.continent_mapping = CONTINENT_MAPPING
     
     def get_continent_for_country(self, country_data: dict) -> Optional[str]:
         """Determine the continent for a country based on various identifiers.
@@ -352,28 +377,36 @@ class ContinentUpdater:
         Returns:
             Continent name or None if not found
         """
-        # Try ISO alpha-2 code first
-        if country_data.get("iso_alpha2") and country_data["iso_alpha2"] != "-99":
-            continent = self.continent_mapping.get(country_data["iso_alpha2"])
-            if continent:
-                return continent
+        # The same countries recur across the three collections, so lookups
+        # are memoized on the identifiers they depend on. ISO codes are keyed
+        # in uppercase, so lowercase or mixed-case codes are normalized first.
+        return self._resolve_continent(
+            (country_data.get("iso_alpha2") or "").upper(),
+            (country_data.get("iso_alpha3") or "").upper(),
+            country_data.get("id"),
+            country_data.get("name"),
+        )
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _resolve_continent(iso_alpha2: Optional[str], iso_alpha3: Optional[str],
+                           country_id: Optional[str], name: Optional[str]) -> Optional[str]:
+        """Look up the continent from a country's identifiers, most specific first."""
+        # Try ISO alpha-2, then ISO alpha-3, then the country ID (normalized
+        # name), stopping at the first hit; "-99" marks a missing ISO code
+        for key in (iso_alpha2, iso_alpha3, country_id):
+            if key and key != "-99":
+                continent = CONTINENT_MAPPING.get(key)
+                if continent:
+                    return continent
         
-        # Try ISO alpha-3 code
-        if country_data.get("iso_alpha3") and country_data["iso_alpha3"] != "-99":
-            continent = self.continent_mapping.get(country_data["iso_alpha3"])
+        # Try the name as-is, then normalized (for names mixing spaces and hyphens)
+        if name:
+            lowered_name = name.lower()
+            continent = _NAME_TO_CONTINENT.get(lowered_name)
             if continent:
                 return continent
-        
-        # Try country ID (normalized name)
-        if country_data.get("id"):
-            continent = self.continent_mapping.get(country_data["id"])
-            if continent:
-                return continent
-        
-        # Try normalized name
-        if country_data.get("name"):
-            normalized_name = country_data["name"].lower().replace(" ", "_").replace("-", "_")
-            continent = self.continent_mapping.get(normalized_name)
+            continent = CONTINENT_MAPPING.get(lowered_name.replace(" ", "_").replace("-", "_"))
             if continent:
                 return continent
         
@@ -389,36 +422,65 @@ class ContinentUpdater:
         Returns:
             Tuple of (updated_count, total_count)
         """
-        logger.info(f"{'[DRY RUN] ' if dry_run else ''}Processing {collection_name} collection...")
+        prefix = "[DRY RUN] " if dry_run else ""
+        logger.info("%sProcessing %s collection...", prefix, collection_name)
         
         collection_ref = self.db.collection(collection_name)
-        docs = collection_ref.where(filter=FieldFilter("is_active", "==", True)).get()
+        # A "continent == None" filter would miss documents that lack the field
+        # entirely, so the skip stays client-side; fetch only the lookup fields
+        docs = collection_ref.where(filter=FieldFilter("is_active", "==", True)).select(_LOOKUP_FIELDS).stream()
         
         updated_count = 0
         total_count = 0
+        pending = []  # (doc_ref, continent) waiting for the next batch commit
+        commits = {}  # future -> number of updates in its batch
         
-        for doc in docs:
-            total_count += 1
-            data = doc.to_dict()
-            
-            # Skip if continent is already set
-            if data.get("continent"):
-                continue
-            
-            continent = self.get_continent_for_country(data)
-            
-            if continent:
-                logger.info(f"{'[DRY RUN] ' if dry_run else ''}Updating {data.get('name', doc.id)} -> {continent}")
+        # Batches touch disjoint documents, so they are committed concurrently
+        # while the scan keeps filling the next one
+        with ThreadPoolExecutor(max_workers=MAX_COMMIT_WORKERS) as executor:
+            for doc in docs:
+                total_count += 1
+                data = doc.to_dict()
                 
-                if not dry_run:
-                    doc.reference.update({"continent": continent})
+                # Skip if continent is already set
+                if data.get("continent"):
+                    continue
                 
-                updated_count += 1
-            else:
-                logger.warning(f"Could not determine continent for: {data.get('name', doc.id)} (ID: {doc.id}, ISO2: {data.get('iso_alpha2')}, ISO3: {data.get('iso_alpha3')})")
+                continent = self.get_continent_for_country(data)
+                
+                if continent:
+                    logger.info("%sUpdating %s -> %s", prefix, data.get("name", doc.id), continent)
+                    
+                    if not dry_run:
+                        pending.append((doc.reference, continent))
+                        if len(pending) == BATCH_SIZE:
+                            commits[executor.submit(self._commit_continents, pending)] = len(pending)
+                            pending = []
+                    
+                    updated_count += 1
+                else:
+                    logger.warning("Could not determine continent for: %s (ID: %s, ISO2: %s, ISO3: %s)",
+                                   data.get("name", doc.id), doc.id, data.get("iso_alpha2"), data.get("iso_alpha3"))
+            
+            if pending:
+                commits[executor.submit(self._commit_continents, pending)] = len(pending)
+            
+            for future in as_completed(commits):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error("Failed to commit %d %s continent updates: %s", commits[future], collection_name, e)
+                    updated_count -= commits[future]
         
         return updated_count, total_count
     
+    def _commit_continents(self, pending: List[Tuple[firestore.DocumentReference, str]]) -> None:
+        """Write a chunk of continent updates in a single batched commit."""
+        batch = self.db.batch()
+        for doc_ref, continent in pending:
+            batch.update(doc_ref, {"continent": continent})
+        batch.commit(retry=COMMIT_RETRY)
+    
     def update_all_continents(self, dry_run: bool = False) -> None:
         """Update continent information for all geographic collections.
         
@@ -429,9 +491,16 @@ class ContinentUpdater:
         total_updated = 0
         total_processed = 0
         
-        for collection_name in collections:
+        # The collections are independent, so scan and update them concurrently
+        with ThreadPoolExecutor(max_workers=len(collections)) as executor:
+            futures = {
+                collection_name: executor.submit(self.update_collection_continents, collection_name, dry_run)
+                for collection_name in collections
+            }
+        
+        for collection_name, future in futures.items():
             try:
-                updated, total = self.update_collection_continents(collection_name, dry_run)
+                updated, total = future.result()
                 total_updated += updated
                 total_processed += total
                 logger.info(f"{'[DRY RUN] ' if dry_run else ''}{collection_name}: {updated}/{total} records {'would be ' if dry_run else ''}updated")
@@ -12,14 +12,26 @@ Usage:
 import argparse
 import logging
 import sys
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Attempts per write before BulkWriter gives up on it
+MAX_WRITE_ATTEMPTS = 5
+
+# gRPC status codes worth retrying: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED,
+# ABORTED, INTERNAL, UNAVAILABLE; anything else (e.g. NOT_FOUND) fails at once
+TRANSIENT_WRITE_ERRORS = frozenset({4, 8, 10, 13, 14})
+
+# Flags probed to check the CDN; several codes exercise more than one cache entry
+CDN_PROBE_CODES = ("us", "gb", "jp", "br", "au")
+
 try:
     from google.cloud import firestore
+    from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriterOptions
     DEPENDENCIES_AVAILABLE = True
 except ImportError as e:
     logger.error(f"Missing dependencies: {e}")
@@ -39,40 +51,53 @@ class CountryFlagURLUpdater:
         self.firestore_client = firestore.Client(project=project_id, database="statlas-content")
         self.cdn_base_url = "https://cdn.statlas.app/flags"
         
+        # Pooled HTTP session for CDN checks, created on first use
+        self._http_session = None
+        self._cdn_checks: Dict[str, bool] = {}
+        
         logger.info(f"Initialized CountryFlagURLUpdater for project: {project_id}")
     
-    def get_country_iso_mappings(self) -> Dict[str, str]:
-        """Get mapping of country IDs to ISO codes from Firestore."""
-        logger.info("Fetching country ISO code mappings from Firestore")
+    def update_flag_urls(self, dry_run: bool = False, touch_timestamp: bool = False) -> int:
+        """Update country documents with Cloudflare CDN flag URLs.
+        
+        updated_at is only bumped when touch_timestamp is set, so a URL-only
+        migration doesn't rewrite (and re-index) the timestamp field.
+        """
+        logger.info("Updating country flag URLs to use Cloudflare CDN")
+        
+        updated_count = 0
+        countries_with_iso = 0
+        failed_writes = []
         
-        countries = {}
-        docs = self.firestore_client.collection("countries").stream()
+        if not dry_run:
+            # BulkWriter keeps many updates in flight at once, with its own throttling
+            # Retried writes back off exponentially instead of linearly
+            bulk_writer = self.firestore_client.bulk_writer(
+                options=BulkWriterOptions(retry=BulkRetry.exponential)
+            )
+            
+            def on_write_error(error, _bulk_writer) -> bool:
+                if error.code in TRANSIENT_WRITE_ERRORS and error.attempts < MAX_WRITE_ATTEMPTS:
+                    return True
+                logger.error(f"Failed to update {error.operation.reference.id}: {error.message}")
+                failed_writes.append(error)
+                return False
+            
+            bulk_writer.on_write_error(on_write_error)
+        
+        # Single pass: each country is checked and queued as it streams in,
+        # so writes start while later documents are still being read
+        docs = self.firestore_client.collection("countries").select(["iso_alpha2", "flag_url"]).stream()
         
         for doc in docs:
             data = doc.to_dict()
             country_id = doc.id
-            iso_alpha2 = data.get("iso_alpha2", "").upper()
-            current_flag_url = data.get("flag_url", "")
+            iso_code = data.get("iso_alpha2", "").upper()
+            if not iso_code:
+                continue
+            countries_with_iso += 1
             
-            if iso_alpha2:
-                countries[country_id] = {
-                    "iso_alpha2": iso_alpha2,
-                    "current_flag_url": current_flag_url
-                }
-        
-        logger.info(f"Found {len(countries)} countries with ISO codes")
-        return countries
-    
-    def update_flag_urls(self, dry_run: bool = False) -> int:
-        """Update country documents with Cloudflare CDN flag URLs."""
-        logger.info("Updating country flag URLs to use Cloudflare CDN")
-        
-        country_mappings = self.get_country_iso_mappings()
-        updated_count = 0
-        
-        for country_id, country_data in country_mappings.items():
-            iso_code = country_data["iso_alpha2"]
-            current_url = country_data["current_flag_url"]
+            current_url = data.get("flag_url", "")
             new_flag_url = f"{self.cdn_base_url}/{iso_code.lower()}.svg"
             
             # Skip if already using CDN URL
@@ -87,41 +112,62 @@ class CountryFlagURLUpdater:
                 updated_count += 1
                 continue
             
-            try:
-                # Update country document
-                doc_ref = self.firestore_client.collection("countries").document(country_id)
-                doc_ref.update({
-                    "flag_url": new_flag_url,
-                    "updated_at": firestore.SERVER_TIMESTAMP
-                })
-                
-                logger.info(f"Updated {country_id} ({iso_code}) -> {new_flag_url}")
-                updated_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to update {country_id}: {e}")
+            payload = {"flag_url": new_flag_url}
+            if touch_timestamp:
+                payload["updated_at"] = firestore.SERVER_TIMESTAMP
+            bulk_writer.update(doc.reference, payload)
+            logger.info(f"Queued {country_id} ({iso_code}) -> {new_flag_url}")
+            updated_count += 1
+        
+        logger.info(f"Found {countries_with_iso} countries with ISO codes")
+        
+        if not dry_run:
+            # Wait for every queued update to finish
+            bulk_writer.close()
+            updated_count -= len(failed_writes)
         
         logger.info(f"Updated {updated_count} country flag URLs")
         return updated_count
     
+    def _get_http_session(self):
+        """Return a shared requests session that keeps CDN connections alive."""
+        if self._http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            
+            self._http_session = requests.Session()
+            self._http_session.mount("https://", HTTPAdapter(pool_maxsize=32))
+        return self._http_session
+    
+    def _check_flag_url(self, url: str) -> Optional[bool]:
+        """HEAD one flag URL; returns None when the request itself failed."""
+        if url in self._cdn_checks:
+            return self._cdn_checks[url]
+        
+        try:
+            response = self._get_http_session().head(url, timeout=10)
+        except Exception as e:
+            logger.error(f"❌ CDN test failed for {url}: {e}")
+            return None  # Not cached, so a later call tries again
+        
+        if response.status_code != 200:
+            logger.warning(f"⚠️ CDN returned status {response.status_code} for {url}")
+        self._cdn_checks[url] = response.status_code == 200
+        return self._cdn_checks[url]
+    
     def verify_cdn_availability(self) -> bool:
         """Verify that the CDN is responding correctly."""
-        import requests
+        test_urls = [f"{self.cdn_base_url}/{code}.svg" for code in CDN_PROBE_CODES]
+        logger.info(f"Testing CDN availability: {', '.join(test_urls)}")
         
-        test_url = f"{self.cdn_base_url}/us.svg"
-        logger.info(f"Testing CDN availability: {test_url}")
+        # Probe concurrently so the check takes about one round trip
+        with ThreadPoolExecutor(max_workers=len(test_urls)) as executor:
+            results = list(executor.map(self._check_flag_url, test_urls))
         
-        try:
-            response = requests.head(test_url, timeout=10)
-            if response.status_code == 200:
-                logger.info("✅ CDN is responding correctly")
-                return True
-            else:
-                logger.warning(f"⚠️ CDN returned status {response.status_code}")
-                return False
-        except Exception as e:
-            logger.error(f"❌ CDN test failed: {e}")
-            return False
+        if all(results):
+            logger.info("✅ CDN is responding correctly")
+            return True
+        return False
 
 
 def main():
@@ -140,6 +186,8 @@ def main():
                        help="Show what would be done without making changes")
     parser.add_argument("--skip-verification", action="store_true",
                        help="Skip CDN availability verification")
+    parser.add_argument("--touch-timestamp", action="store_true",
+                       help="Also set updated_at on every country whose flag URL changes")
     
     args = parser.parse_args()
     
@@ -158,7 +206,7 @@ def main():
         
         # Step 2: Update flag URLs
         logger.info("Step 2: Updating country flag URLs...")
-        updated_count = updater.update_flag_urls(dry_run=args.dry_run)
+        updated_count = updater.update_flag_urls(dry_run=args.dry_run, touch_timestamp=args.touch_timestamp)
         
         if args.dry_run:
             logger.info(f"Dry run complete: {updated_count} countries would be updated")
@@ -4,103 +4,243 @@ Quick script to update specific countries with continent data as requested.
 """
 
 import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Sequence
 from google.cloud import firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriterOptions
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def update_specific_continents(project_id: str, dry_run: bool = True):
-    """Update specific countries with continent mappings."""
+# Attempts per write before BulkWriter gives up on it
+MAX_WRITE_ATTEMPTS = 5
+
+# gRPC status codes worth retrying: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED,
+# ABORTED, INTERNAL, UNAVAILABLE; anything else (e.g. NOT_FOUND) fails at once
+TRANSIENT_WRITE_ERRORS = frozenset({4, 8, 10, 13, 14})
+
+# Collections the specific mappings are applied to by default
+COLLECTIONS = ("sovereign_states", "countries", "map_units")
+
+# Maximum number of values Firestore accepts in an "in" filter
+IN_QUERY_LIMIT = 30
+
+# Maximum number of operations Firestore accepts in one batched write
+BATCH_SIZE = 500
+
+# Continent for each document ID that needs one set by hand
+_CONTINENT_MAPPINGS: Mapping[str, str] = MappingProxyType({
+    # Major countries/territories
+    "united_states_of_america": "North America",
+    "macao": "Asia", 
+    "w_sahara": "Africa",
+    
+    # European territories
+    "åland": "Europe",  # Will also rename to start with 'A'
+    "faeroe_is": "Europe",
+    "gibraltar": "Europe", 
+    "guernsey": "Europe",
+    "isle_of_man": "Europe",
+    "jersey": "Europe",
+    
+    # Everything else gets 'Other' for now
+    "fr_s_antarctic_lands": "Other",
+    "heard_i_and_mcdonald_is": "Other",
+    "s_geo_and_the_is": "Other",
+    "ashmore_and_cartier_is": "Other",
+    "coral_sea_is": "Other",
+    "u_s_minor_outlying_is": "Other",
+    "br_indian_ocean_ter": "Other",
+    "indian_ocean_ter": "Other",
+    "saint_helena": "Other",
+    "brazilian_i": "Other",
+    "clipperton_i": "Other",
+    "n_cyprus": "Other",
+    "cyprus_u_n_buffer_zone": "Other",
+    "baikonur": "Other",
+    "siachen_glacier": "Other",
+    "usnb_guantanamo_bay": "Other",
+    "bir_tawil": "Other",
+    "southern_patagonian_ice_field": "Other",
+    "scarborough_reef": "Other",
+    "spratly_is": "Other",
+    "bajo_nuevo_bank": "Other",
+    "serranilla_bank": "Other",
+})
+
+# Names replaced along with the continent, by document ID
+_RENAMES: Mapping[str, str] = MappingProxyType({
+    "åland": "Aland",  # So it sorts under 'A'
+})
+
+def fetch_target_documents(db, collection_ref, target_ids, read_time: Optional[datetime] = None):
+    """Fetch the active documents whose stored id field or document ID is one of target_ids.
+    
+    Documents keyed by a target ID come back from one batched get_all(); those
+    whose "id" field names a target under a different document ID are found
+    with "in" queries. Each document is yielded once, with only the fields the
+    updater reads. With read_time, every read sees the database as of that moment.
+    """
+    target_ids = list(target_ids)
+    seen = set()
+    
+    refs = [collection_ref.document(doc_id) for doc_id in target_ids]
+    for doc in db.get_all(refs, field_paths=["id", "name", "is_active"], read_time=read_time):
+        if doc.exists and doc.to_dict().get("is_active") is True:
+            seen.add(doc.id)
+            yield doc
+    
+    active = collection_ref.select(["id", "name"]).where(filter=FieldFilter("is_active", "==", True))
+    for start in range(0, len(target_ids), IN_QUERY_LIMIT):
+        chunk = target_ids[start:start + IN_QUERY_LIMIT]
+        for doc in active.where(filter=FieldFilter("id", "in", chunk)).stream(read_time=read_time):
+            if doc.id not in seen:
+                seen.add(doc.id)
+                yield doc
+
+def build_update(doc_id: str, continent: str) -> Dict[str, str]:
+    """Build the fields to write for a mapped document, including any rename."""
+    update_data = {"continent": continent}
+    # Special case for renames such as Åland - change name to start with 'A'
+    if doc_id in _RENAMES:
+        update_data["name"] = _RENAMES[doc_id]
+    return update_data
+
+# Firestore clients by project, so repeated calls reuse one gRPC channel
+_clients: Dict[str, firestore.Client] = {}
+
+def get_firestore_client(project_id: str) -> firestore.Client:
+    """Return the process-wide Firestore client for a project, creating it on first use."""
+    if project_id not in _clients:
+        # Initialize Firestore client with explicit database name
+        _clients[project_id] = firestore.Client(project=project_id, database='statlas-content')
+    return _clients[project_id]
+
+def update_specific_continents(project_id: str, dry_run: bool = True, db: Optional[firestore.Client] = None,
+                               atomic: bool = False, collections: Sequence[str] = COLLECTIONS):
+    """Update specific countries with continent mappings.
+    
+    The shared client for project_id is used unless db is given. With atomic,
+    nothing is written until every collection has been read, and the updates
+    are then applied in WriteBatch commits of up to 500 (all-or-nothing when
+    they fit in one); otherwise they go through a BulkWriter as they are found.
+    Only the given collections are read and updated.
+    """
+    if not collections:
+        raise ValueError("collections must name at least one collection")
+    
+    if db is None:
+        db = get_firestore_client(project_id)
+    
+    collection_refs = {name: db.collection(name) for name in collections}
     
-    # Initialize Firestore client with explicit database name
-    db = firestore.Client(project=project_id, database='statlas-content')
+    # Read every collection from the same snapshot, so writes from other
+    # processes during the run can't make the collections disagree; a second
+    # back keeps it from landing ahead of the server clock
+    read_time = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(seconds=1)
     
-    # Define the specific mappings
-    mappings = {
-        # Major countries/territories
-        "united_states_of_america": "North America",
-        "macao": "Asia", 
-        "w_sahara": "Africa",
+    pending = []  # (doc_ref, update_data) for atomic runs
+    # Server-confirmed writes and final failures per collection
+    confirmed = Counter()
+    failed = Counter()
+    counts_lock = threading.Lock()
+    
+    if not dry_run and not atomic:
+        # BulkWriter batches and parallelizes the updates across all collections;
+        # retried writes back off exponentially instead of linearly
+        bulk_writer = db.bulk_writer(options=BulkWriterOptions(retry=BulkRetry.exponential))
+        
+        # Both callbacks run on the writer's worker threads
+        def on_write_result(reference, _result, _bulk_writer):
+            with counts_lock:
+                confirmed[reference.parent.id] += 1
         
-        # European territories
-        "åland": "Europe",  # Will also rename to start with 'A'
-        "faeroe_is": "Europe",
-        "gibraltar": "Europe", 
-        "guernsey": "Europe",
-        "isle_of_man": "Europe",
-        "jersey": "Europe",
+        def on_write_error(error, _bulk_writer) -> bool:
+            if error.code in TRANSIENT_WRITE_ERRORS and error.attempts < MAX_WRITE_ATTEMPTS:
+                return True
+            logger.error("Failed to update %s: %s", error.operation.reference.path, error.message)
+            with counts_lock:
+                failed[error.operation.reference.parent.id] += 1
+            return False
         
-        # Everything else gets 'Other' for now
-        "fr_s_antarctic_lands": "Other",
-        "heard_i_and_mcdonald_is": "Other",
-        "s_geo_and_the_is": "Other",
-        "ashmore_and_cartier_is": "Other",
-        "coral_sea_is": "Other",
-        "u_s_minor_outlying_is": "Other",
-        "br_indian_ocean_ter": "Other",
-        "indian_ocean_ter": "Other",
-        "saint_helena": "Other",
-        "brazilian_i": "Other",
-        "clipperton_i": "Other",
-        "n_cyprus": "Other",
-        "cyprus_u_n_buffer_zone": "Other",
-        "baikonur": "Other",
-        "siachen_glacier": "Other",
-        "usnb_guantanamo_bay": "Other",
-        "bir_tawil": "Other",
-        "southern_patagonian_ice_field": "Other",
-        "scarborough_reef": "Other",
-        "spratly_is": "Other",
-        "bajo_nuevo_bank": "Other",
-        "serranilla_bank": "Other",
-    }
-    
-    collections = ["sovereign_states", "countries", "map_units"]
-    total_updated = 0
-    
-    for collection_name in collections:
-        logger.info(f"Processing {collection_name} collection...")
-        collection_ref = db.collection(collection_name)
+        bulk_writer.on_write_result(on_write_result)
+        bulk_writer.on_write_error(on_write_error)
+    
+    # BulkWriter (and the pending list) isn't safe for concurrent callers, so enqueues are serialized
+    write_lock = threading.Lock()
+    
+    def process_collection(collection_name: str) -> int:
+        """Update (or report) the mapped documents in one collection."""
+        logger.info("Processing %s collection...", collection_name)
+        collection_ref = collection_refs[collection_name]
         
-        # Get all active documents
-        docs = collection_ref.where(filter=FieldFilter("is_active", "==", True)).get()
+        # Get only the active documents named in the mappings
+        docs = fetch_target_documents(db, collection_ref, _CONTINENT_MAPPINGS, read_time)
         updated_in_collection = 0
         
         for doc in docs:
             doc_data = doc.to_dict()
             doc_id = doc_data.get("id", doc.id)
             
-            if doc_id in mappings:
-                continent = mappings[doc_id]
+            continent = _CONTINENT_MAPPINGS.get(doc_id)
+            if continent is not None:
+                update_data = build_update(doc_id, continent)
+                logger.info("%s %s/%s (%s): %s", "[DRY RUN] Would update" if dry_run else "Updating",
+                            collection_name, doc.id, doc_data.get("name"), update_data)
                 
-                if dry_run:
-                    logger.info(f"[DRY RUN] Would update {collection_name}/{doc.id}: {doc_data.get('name')} -> continent: {continent}")
-                    
-                    # Special case for Åland rename
-                    if doc_id == "åland":
-                        logger.info(f"[DRY RUN] Would also rename 'Åland' to 'Aland' (starting with 'A')")
-                else:
-                    # Prepare update data
-                    update_data = {"continent": continent}
-                    
-                    # Special case for Åland - change name to start with 'A'
-                    if doc_id == "åland":
-                        update_data["name"] = "Aland"
-                        logger.info(f"Updating {collection_name}/{doc.id}: continent -> {continent}, name -> Aland")
-                    else:
-                        logger.info(f"Updating {collection_name}/{doc.id}: {doc_data.get('name')} -> continent: {continent}")
-                    
-                    # Update the document
-                    doc.reference.update(update_data)
+                if not dry_run:
+                    # Queue the update; it is sent in the background, or held for the atomic commit
+                    with write_lock:
+                        if atomic:
+                            pending.append((doc.reference, update_data))
+                        else:
+                            bulk_writer.update(doc.reference, update_data)
                 
                 updated_in_collection += 1
         
-        logger.info(f"{'[DRY RUN] Would update' if dry_run else 'Updated'} {updated_in_collection} documents in {collection_name}")
-        total_updated += updated_in_collection
+        logger.info("%s %d documents in %s", "[DRY RUN] Would update" if dry_run else "Queued updates for",
+                    updated_in_collection, collection_name)
+        return updated_in_collection
+    
+    try:
+        # The collections are independent, so their queries run concurrently
+        with ThreadPoolExecutor(max_workers=len(collections)) as executor:
+            total_updated = sum(executor.map(process_collection, collections))
+        
+        if not dry_run and atomic:
+            if len(pending) > BATCH_SIZE:
+                logger.warning("%d updates exceed one batch; committing %d at a time", len(pending), BATCH_SIZE)
+            for start in range(0, len(pending), BATCH_SIZE):
+                chunk = pending[start:start + BATCH_SIZE]
+                batch = db.batch()
+                for doc_ref, update_data in chunk:
+                    batch.update(doc_ref, update_data)
+                batch.commit()
+                confirmed.update(doc_ref.parent.id for doc_ref, _ in chunk)
+    finally:
+        if not dry_run and not atomic:
+            # Wait for every queued update to finish, even if a collection failed
+            bulk_writer.close()
+        
+        if not dry_run:
+            # Report what the server confirmed rather than what was queued
+            for collection_name in collections:
+                if failed[collection_name]:
+                    logger.info("Updated %d documents in %s (%d failed)", confirmed[collection_name],
+                                collection_name, failed[collection_name])
+                else:
+                    logger.info("Updated %d documents in %s", confirmed[collection_name], collection_name)
+    
+    if not dry_run:
+        total_updated = sum(confirmed.values())
     
-    logger.info(f"{'[DRY RUN] Would update' if dry_run else 'Updated'} {total_updated} total documents")
+    logger.info("%s %d total documents", "[DRY RUN] Would update" if dry_run else "Updated", total_updated)
     return total_updated
 
 def main():
@@ -109,19 +249,24 @@ def main():
     parser = argparse.ArgumentParser(description='Update specific countries with continent data')
     parser.add_argument('--project-id', required=True, help='Google Cloud Project ID')
     parser.add_argument('--dry-run', action='store_true', help='Show what would be updated without making changes')
+    parser.add_argument('--atomic', action='store_true',
+                        help='Apply all updates in batched commits (all-or-nothing up to 500) instead of a BulkWriter')
+    parser.add_argument('--collections', nargs='+', choices=COLLECTIONS, default=list(COLLECTIONS),
+                        help='Collections to update (default: all)')
     
     args = parser.parse_args()
     
-    logger.info(f"Starting continent updates for project: {args.project_id}")
+    logger.info("Starting continent updates for project: %s", args.project_id)
     if args.dry_run:
         logger.info("DRY RUN MODE - No changes will be made")
     
     try:
-        total_updated = update_specific_continents(args.project_id, args.dry_run)
+        update_specific_continents(args.project_id, args.dry_run, atomic=args.atomic,
+                                   collections=args.collections)
         logger.info("Script completed successfully!")
         
     except Exception as e:
-        logger.error(f"Error during update: {e}")
+        logger.error("Error during update: %s", e)
         raise
 
 if __name__ == "__main__":